@@ -1,14 +1,123 @@
-import google.generativeai as genai
-from config import GEMINI_API_KEY
+import re
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    GEMINI_API_KEY, AI_COMBINED_MODE, AI_BATCH_PROMPT_CHARS,
+    LLM_BACKEND, STUB_LATENCY, STUB_FAILURE_RATE
+)
+from stub_model import StubModel
+from cache import ResponseCache
+import metrics
+
+MODEL_NAME = 'gemini-pro'
+
+# Section headings the prompts ask for, and synonyms models tend to use
+SECTION_HEADERS = {
+    'INSIGHTS': 'insights',
+    'KEY INSIGHTS': 'insights',
+    'RECOMMENDATIONS': 'recommendations',
+    'RISK FACTORS': 'risk_factors',
+    'RISKS': 'risk_factors',
+    'MARKET CONTEXT': 'market_context',
+    'QUICK ADVICE': 'quick_advice',
+}
+
+# "INSIGHTS:", "**Risk Factors:**", "## Market Context", "3. RECOMMENDATIONS: ..."
+HEADER_RE = re.compile(
+    r'^\s*(?:#+\s*)?(?:\d+[.)]\s*)?[*_]*\s*(' + '|'.join(SECTION_HEADERS) + r')\s*[*_]*\s*(:)?\s*[*_]*\s*(.*)$',
+    re.IGNORECASE
+)
+
+# "- item", "* item", "• item", "1. item", "2) item"
+BULLET_RE = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+(.*)$')
+
+# "=== STOCK: TCS ===" lines separating stocks in batch prompts and responses
+STOCK_MARKER_RE = re.compile(r'^[\s#*=]*STOCK:\s*(.+?)[\s#*=]*$', re.MULTILINE | re.IGNORECASE)
+
+BATCH_PROMPT_HEADER = """
+        You are a professional stock market analyst. Analyze each of the following Indian stocks and provide insights.
+
+        For EVERY stock, start its answer with the line "=== STOCK: <name exactly as given> ===" followed by:
+
+        INSIGHTS:
+        [Provide 2-3 key insights about the stock's financial health and performance]
+
+        RECOMMENDATIONS:
+        [Provide 3-4 specific recommendations for investors]
+
+        RISK FACTORS:
+        [List 3-4 potential risk factors to consider]
+
+        MARKET CONTEXT:
+        [Brief analysis of how this stock fits in the current market environment]
+
+        QUICK ADVICE:
+        [Brief (2-3 sentences) practical, actionable advice for a retail investor]
+
+        Keep each answer concise, professional, and actionable. Focus on practical investment advice.
+
+        STOCKS:
+"""
+
+def _match_section_header(line):
+    """(section, trailing content) if the line opens a section, else None"""
+    match = HEADER_RE.match(line)
+    if not match:
+        return None
+    heading, colon, content = match.groups()
+    # Without a colon the heading must stand alone, so prose starting with "Risks ..." isn't a header
+    if not colon and content.strip():
+        return None
+    return SECTION_HEADERS[heading.upper()], content.strip()
+
+def _strip_markdown(text):
+    """Drop bold/italic markers and surrounding whitespace"""
+    return re.sub(r'(\*\*|__)', '', text).strip()
+
+def is_error_result(result):
+    """True for the placeholder analysis returned when the model call or parsing failed"""
+    return (result.get('insights', '').startswith(('Error getting AI insights', 'Error parsing AI response'))
+            or result.get('quick_advice', '').startswith('Unable to get AI advice'))
 
 class AIAdvisor:
-    def __init__(self):
-        if GEMINI_API_KEY:
+    def __init__(self, response_cache=None, model=None, single_flight=None):
+        self.model_name = MODEL_NAME
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        if model is not None:
+            self.model = model
+        elif LLM_BACKEND == 'stub':
+            self.model_name = 'stub'
+            self.model = StubModel(latency=STUB_LATENCY, failure_rate=STUB_FAILURE_RATE)
+        elif GEMINI_API_KEY:
+            # The Gemini SDK is slow to import; only load it when it will be used
+            import google.generativeai as genai
             genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-pro')
+            self.model = genai.GenerativeModel(self.model_name)
         else:
             self.model = None
     
+    def _generate(self, prompt):
+        """Get the model's response text, reusing a cached answer for an identical prompt"""
+        if self.single_flight is None:
+            return self._generate_uncoalesced(prompt)
+        # Identical prompts already in flight share one model call
+        key = ResponseCache.make_key(self.model_name, prompt)
+        return self.single_flight.do(key, self._generate_uncoalesced, prompt)
+    
+    def _generate_uncoalesced(self, prompt):
+        """Cache lookup, model call and cache store for one prompt"""
+        if self.response_cache:
+            cached = self.response_cache.get(self.model_name, prompt)
+            metrics.count('ai_cache_lookups', result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                return cached
+        
+        with metrics.span('ai_call', model=self.model_name):
+            text = self.model.generate_content(prompt).text
+        if self.response_cache:
+            self.response_cache.put(self.model_name, prompt, text)
+        return text
+    
     def get_ai_insights(self, stock_name, financial_data, analysis_result):
         """Get AI-powered insights and recommendations"""
         if not self.model:
@@ -24,10 +133,10 @@ class AIAdvisor:
             prompt = self._create_analysis_prompt(stock_name, financial_data, analysis_result)
             
             # Get AI response
-            response = self.model.generate_content(prompt)
+            response_text = self._generate(prompt)
             
             # Parse the response
-            return self._parse_ai_response(response.text)
+            return self._parse_ai_response(response_text)
             
         except Exception as e:
             return {
@@ -37,22 +146,18 @@ class AIAdvisor:
                 'market_context': 'Error occurred while analyzing'
             }
     
-    def _create_analysis_prompt(self, stock_name, financial_data, analysis_result):
+    def _create_analysis_prompt(self, stock_name, financial_data, analysis_result, include_quick_advice=False):
         """Create a comprehensive prompt for AI analysis"""
         
-        # Format financial data
-        financial_summary = "\n".join([
-            f"{key.replace('_', ' ').title()}: {value}" 
-            for key, value in financial_data.items() 
-            if value is not None
-        ])
+        financial_summary = self._format_financial_summary(financial_data)
+        analysis_summary = self._format_analysis_summary(analysis_result)
         
-        # Format analysis results
-        analysis_summary = f"""
-        Verdict: {analysis_result['verdict']}
-        Score: {analysis_result['score']}/{analysis_result['total_criteria']} ({analysis_result['score_percentage']:.1f}%)
-        Reason: {analysis_result['reason']}
-        """
+        quick_advice_section = ""
+        if include_quick_advice:
+            quick_advice_section = """
+        QUICK ADVICE:
+        [Brief (2-3 sentences) practical, actionable advice for a retail investor]
+"""
         
         prompt = f"""
         You are a professional stock market analyst. Analyze the following Indian stock data and provide insights:
@@ -78,65 +183,132 @@ class AIAdvisor:
 
         MARKET CONTEXT:
         [Brief analysis of how this stock fits in the current market environment]
-
+{quick_advice_section}
         Keep your response concise, professional, and actionable. Focus on practical investment advice.
         """
         
         return prompt
     
+    def _format_financial_summary(self, financial_data):
+        """One 'Metric: value' line per available metric"""
+        return "\n".join([
+            f"{key.replace('_', ' ').title()}: {value}" 
+            for key, value in financial_data.items() 
+            if value is not None
+        ])
+    
+    def _format_analysis_summary(self, analysis_result):
+        """Verdict, score and reason block for prompts"""
+        return f"""
+        Verdict: {analysis_result['verdict']}
+        Score: {analysis_result['score']}/{analysis_result['total_criteria']} ({analysis_result['score_percentage']:.1f}%)
+        Reason: {analysis_result['reason']}
+        """
+    
+    def _create_stock_block(self, stock_name, financial_data, analysis_result):
+        """One stock's section of a batch prompt"""
+        return f"""
+        === STOCK: {stock_name} ===
+        FINANCIAL DATA:
+        {self._format_financial_summary(financial_data)}
+
+        ANALYSIS RESULTS:
+        {self._format_analysis_summary(analysis_result)}
+"""
+    
+    def _group_stocks(self, stocks, max_prompt_chars):
+        """Split stocks into groups whose batch prompt fits in max_prompt_chars"""
+        groups = []
+        current, size = [], len(BATCH_PROMPT_HEADER)
+        for stock in stocks:
+            block = self._create_stock_block(*stock)
+            if current and size + len(block) > max_prompt_chars:
+                groups.append(current)
+                current, size = [], len(BATCH_PROMPT_HEADER)
+            current.append((stock, block))
+            size += len(block)
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _split_batch_response(self, response_text):
+        """Map upper-cased stock name -> that stock's part of a batch response"""
+        parts = {}
+        matches = list(STOCK_MARKER_RE.finditer(response_text))
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(response_text)
+            parts[match.group(1).strip().upper()] = response_text[match.end():end]
+        return parts
+    
+    def iter_batch_analysis(self, stocks, max_prompt_chars=AI_BATCH_PROMPT_CHARS):
+        """Yield (stock_name, full analysis) for (stock_name, financial_data, analysis_result) tuples.
+        
+        Stocks are packed several to a prompt under max_prompt_chars. Any stock
+        whose section is missing or unparseable is retried with its own call.
+        """
+        for group in self._group_stocks(stocks, max_prompt_chars):
+            parts = {}
+            if self.model:
+                prompt = BATCH_PROMPT_HEADER + "".join(block for _, block in group)
+                try:
+                    parts = self._split_batch_response(self._generate(prompt))
+                except Exception as e:
+                    print(f"Batch AI call failed, falling back to per-stock calls: {e}")
+            
+            for stock, _ in group:
+                stock_name = stock[0]
+                part = parts.get(stock_name.strip().upper())
+                result = self._parse_ai_response(part) if part else None
+                if not result or not result['quick_advice'] or result['insights'] == 'No specific insights available':
+                    result = self.get_full_analysis(*stock)
+                yield stock_name, result
+    
+    def get_batch_analysis(self, stocks, max_prompt_chars=AI_BATCH_PROMPT_CHARS):
+        """Dict of stock_name -> full analysis; see iter_batch_analysis"""
+        return dict(self.iter_batch_analysis(stocks, max_prompt_chars))
+    
     def _parse_ai_response(self, response_text):
         """Parse the AI response into structured format"""
         try:
-            sections = response_text.split('\n\n')
-            
-            insights = []
-            recommendations = []
-            risk_factors = []
-            market_context = ""
-            
+            sections = {name: [] for name in set(SECTION_HEADERS.values())}
             current_section = None
+            current_item = None
             
-            for section in sections:
-                section = section.strip()
-                if not section:
+            for line in response_text.splitlines():
+                header = _match_section_header(line)
+                if header:
+                    current_section, content = header
+                    current_item = None
+                    line = content
+                    if not line:
+                        continue
+                
+                if current_section is None:
+                    continue
+                
+                if not line.strip():
+                    # A blank line ends the current item
+                    current_item = None
                     continue
-                    
-                if section.startswith('INSIGHTS:'):
-                    current_section = 'insights'
-                    content = section.replace('INSIGHTS:', '').strip()
-                    if content:
-                        insights.append(content)
-                elif section.startswith('RECOMMENDATIONS:'):
-                    current_section = 'recommendations'
-                    content = section.replace('RECOMMENDATIONS:', '').strip()
-                    if content:
-                        recommendations.append(content)
-                elif section.startswith('RISK FACTORS:'):
-                    current_section = 'risk_factors'
-                    content = section.replace('RISK FACTORS:', '').strip()
-                    if content:
-                        risk_factors.append(content)
-                elif section.startswith('MARKET CONTEXT:'):
-                    current_section = 'market_context'
-                    content = section.replace('MARKET CONTEXT:', '').strip()
-                    if content:
-                        market_context = content
-                elif current_section:
-                    # Continue adding to current section
-                    if current_section == 'insights':
-                        insights.append(section)
-                    elif current_section == 'recommendations':
-                        recommendations.append(section)
-                    elif current_section == 'risk_factors':
-                        risk_factors.append(section)
-                    elif current_section == 'market_context':
-                        market_context += " " + section
+                
+                bullet = BULLET_RE.match(line)
+                text = _strip_markdown(bullet.group(1) if bullet else line)
+                if not text:
+                    continue
+                
+                items = sections[current_section]
+                if bullet or current_item is None:
+                    items.append(text)
+                    current_item = len(items) - 1
+                else:
+                    items[current_item] += " " + text
             
             return {
-                'insights': '\n'.join(insights) if insights else 'No specific insights available',
-                'recommendations': recommendations,
-                'risk_factors': risk_factors,
-                'market_context': market_context if market_context else 'Market context not available'
+                'insights': '\n'.join(sections['insights']) if sections['insights'] else 'No specific insights available',
+                'recommendations': sections['recommendations'],
+                'risk_factors': sections['risk_factors'],
+                'market_context': ' '.join(sections['market_context']) or 'Market context not available',
+                'quick_advice': ' '.join(sections['quick_advice'])
             }
             
         except Exception as e:
@@ -144,22 +316,56 @@ class AIAdvisor:
                 'insights': f'Error parsing AI response: {str(e)}',
                 'recommendations': [],
                 'risk_factors': [],
-                'market_context': 'Unable to parse market context'
+                'market_context': 'Unable to parse market context',
+                'quick_advice': ''
             }
     
+    def get_full_analysis(self, stock_name, financial_data, analysis_result, combined=AI_COMBINED_MODE):
+        """Insights, recommendations, risks, market context and quick advice together.
+        
+        combined=True asks for everything in one structured response; otherwise
+        get_ai_insights and get_quick_advice run concurrently.
+        """
+        if self.model and combined:
+            try:
+                prompt = self._create_analysis_prompt(
+                    stock_name, financial_data, analysis_result, include_quick_advice=True
+                )
+                result = self._parse_ai_response(self._generate(prompt))
+                if not result['quick_advice']:
+                    # The model skipped the section; ask for it on its own
+                    result['quick_advice'] = self.get_quick_advice(stock_name, analysis_result['verdict'])
+                return result
+            except Exception as e:
+                return {
+                    'insights': f'Error getting AI insights: {str(e)}',
+                    'recommendations': [],
+                    'risk_factors': [],
+                    'market_context': 'Error occurred while analyzing',
+                    'quick_advice': f"Unable to get AI advice: {str(e)}"
+                }
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            insights = executor.submit(self.get_ai_insights, stock_name, financial_data, analysis_result)
+            quick_advice = executor.submit(self.get_quick_advice, stock_name, analysis_result['verdict'])
+            result = insights.result()
+            result['quick_advice'] = quick_advice.result()
+        return result
+    
+    def _create_quick_advice_prompt(self, stock_name, verdict):
+        """Prompt asking for a few sentences of advice on the verdict"""
+        return f"""
+            Given that {stock_name} has a verdict of {verdict}, provide a brief (2-3 sentences) 
+            investment advice for a retail investor. Be practical and actionable.
+            """
+    
     def get_quick_advice(self, stock_name, verdict):
         """Get quick AI advice based on verdict"""
         if not self.model:
             return "AI advisor not available"
         
         try:
-            prompt = f"""
-            Given that {stock_name} has a verdict of {verdict}, provide a brief (2-3 sentences) 
-            investment advice for a retail investor. Be practical and actionable.
-            """
-            
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generate(self._create_quick_advice_prompt(stock_name, verdict)).strip()
             
         except Exception as e:
             return f"Unable to get AI advice: {str(e)}" 
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+HTTP API for stock analysis
+
+Run with: uvicorn api_server:app --port 8000   (or: python api_server.py)
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from batch_runner import analyze_ticker, unique_tickers
+from cache import get_shared_cache, get_response_cache
+from company_index import get_company_index
+from data_fetcher import get_driver_pool
+from http_transport import get_transport
+from llm_scheduler import AsyncAIAdvisor
+from ai_advisor import AIAdvisor
+from stock_analyzer import StockAnalyzer
+from singleflight import get_group, all_stats
+import metrics
+from config import API_HOST, API_PORT, API_WORKERS
+
+# Blocking scraping runs here so a slow page never stalls the event loop
+executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix='analysis')
+analyzer = StockAnalyzer()
+ai_advisor = None
+
+class BatchRequest(BaseModel):
+    tickers: List[str]
+    refresh: bool = False
+    ai: bool = False
+
+def get_ai_advisor():
+    """AsyncAIAdvisor created on first use, inside the running event loop"""
+    global ai_advisor
+    if ai_advisor is None:
+        ai_advisor = AsyncAIAdvisor(
+            AIAdvisor(response_cache=get_response_cache(), single_flight=get_group('ai')),
+            single_flight=get_group('ai_async', async_group=True)
+        )
+    return ai_advisor
+
+async def run_analysis(ticker, refresh=False, ai=False):
+    """Fetch and score a ticker in the worker pool, then optionally add AI output"""
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        executor, analyze_ticker, ticker, get_driver_pool(), analyzer,
+        get_shared_cache(), get_company_index(), refresh, get_transport()
+    )
+    if ai and result['status'] == 'ok':
+        result['ai'] = await get_ai_advisor().get_full_analysis(
+            ticker, result['financial_data'], result['analysis']
+        )
+    return result
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+    get_driver_pool().close()
+
+app = FastAPI(title="Stock Analysis API", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    """Liveness plus browser pool, cache and HTTP transport counters"""
+    return {
+        'status': 'ok',
+        'driver_pool': get_driver_pool().stats(),
+        'cache': get_shared_cache().stats(),
+        'http': get_transport().stats(),
+        'single_flight': all_stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Pipeline span timings, counters and histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/analyze/{ticker}")
+async def analyze(ticker: str, refresh: bool = False, ai: bool = True):
+    """Analysis (and by default AI insights) for one ticker"""
+    result = await run_analysis(ticker, refresh=refresh, ai=ai)
+    if result['status'] == 'not_found':
+        raise HTTPException(status_code=404, detail=f"Stock not found: {ticker}")
+    if result['status'] == 'error':
+        raise HTTPException(status_code=502, detail=result['error'])
+    return result
+
+@app.post("/batch")
+async def batch(request: BatchRequest):
+    """Analyze many tickers concurrently, streaming one JSON line per ticker as it finishes"""
+    tickers = unique_tickers(request.tickers)
+    
+    async def stream():
+        tasks = [
+            asyncio.create_task(run_analysis(t, refresh=request.refresh, ai=request.ai))
+            for t in tickers
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -0,0 +1,258 @@
+"""
+Batch mode: screen a whole watchlist with bounded concurrency
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from driver_pool import DriverPool
+from singleflight import get_group
+from stock_analyzer import StockAnalyzer
+from config import DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB, SNAPSHOT_DIR
+
+def load_tickers(path):
+    """Read tickers from a file: one per line or comma separated, '#' starts a comment"""
+    tickers = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            tickers.extend(t.strip() for t in line.split(','))
+    return unique_tickers(tickers)
+
+def unique_tickers(tickers):
+    """Drop blanks and duplicates (case-insensitive), keeping the first occurrence"""
+    seen = set()
+    result = []
+    for ticker in tickers:
+        key = ticker.strip().upper()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(ticker.strip())
+    return result
+
+def analyze_ticker(ticker, driver_pool, analyzer, cache=None, company_index=None,
+                   refresh=False, session=None, incremental=False, with_peers=False):
+    """Search, fetch and analyze one ticker; never raises.
+    
+    with_peers=True also reads the page's peer table into result['peers'].
+    """
+    # The scraping stack loads on first use, so load_tickers stays cheap to import
+    from data_fetcher import StockDataFetcher
+    
+    start = time.perf_counter()
+    fetcher = StockDataFetcher(
+        driver_pool=driver_pool, cache=cache, company_index=company_index,
+        session=session, single_flight=get_group('fetch'), verbose=False
+    )
+    result = {'ticker': ticker, 'status': 'ok'}
+    try:
+        stock_data = fetcher.get_stock_data(ticker, refresh=refresh, incremental=incremental)
+        if not stock_data:
+            result['status'] = 'not_found'
+        else:
+            analysis = analyzer.analyze_stock(stock_data['financial_data'])
+            result.update({
+                'url': stock_data['url'],
+                'fetch_source': stock_data['fetch_source'],
+                'financial_data': stock_data['financial_data'],
+                'analysis': analysis,
+            })
+            if 'changed' in stock_data:
+                result['changed'] = stock_data['changed']
+            if with_peers:
+                result['peers'] = fetcher.get_peers(stock_data['url'], fetcher.last_page_html)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    finally:
+        fetcher.close()
+        result['seconds'] = time.perf_counter() - start
+    return result
+
+def format_result(result):
+    """One-line summary of a finished ticker"""
+    if result['status'] == 'ok':
+        analysis = result['analysis']
+        return (f"{result['ticker']:<15} {analysis['verdict']:<5} "
+                f"{analysis['score']}/{analysis.get('total_criteria', 0)} "
+                f"({analysis.get('score_percentage', 0):.1f}%)  "
+                f"[{result['fetch_source']}, {result['seconds']:.1f}s]")
+    if result['status'] == 'not_found':
+        return f"{result['ticker']:<15} ❌ not found  [{result['seconds']:.1f}s]"
+    return f"{result['ticker']:<15} ❌ error: {result['error']}  [{result['seconds']:.1f}s]"
+
+def new_batch_pool(browser_workers):
+    """A private pool capping how many Chrome instances a batch can start"""
+    from data_fetcher import create_chrome_driver
+    
+    return DriverPool(
+        create_chrome_driver,
+        max_size=browser_workers,
+        max_pages=DRIVER_MAX_PAGES,
+        max_rss_mb=DRIVER_MAX_RSS_MB
+    )
+
+def run_batch(tickers, workers=8, browser_workers=2, cache=None, company_index=None,
+              refresh=False, on_result=None, incremental=False, with_peers=False,
+              driver_pool=None):
+    """Analyze tickers concurrently, calling on_result as each one finishes.
+    
+    Without a driver_pool the batch starts (and closes) a private one of
+    browser_workers Chrome instances.
+    """
+    tickers = unique_tickers(tickers)
+    analyzer = StockAnalyzer()
+    owns_pool = driver_pool is None
+    if owns_pool:
+        driver_pool = new_batch_pool(browser_workers)
+    results = {}
+    start = time.perf_counter()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    analyze_ticker, ticker, driver_pool, analyzer, cache, company_index, refresh,
+                    incremental=incremental, with_peers=with_peers
+                )
+                for ticker in tickers
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['ticker']] = result
+                if on_result:
+                    on_result(result)
+    finally:
+        if owns_pool:
+            driver_pool.close()
+    
+    elapsed = time.perf_counter() - start
+    return [results[t] for t in tickers], elapsed
+
+def harvest_peers(seed_results, analyzer, cache=None, company_index=None, refresh=False):
+    """Score the peers listed on the seed pages from their peer-table rows.
+    
+    Returns (results, undecided): results for peers whose row already settles
+    the verdict (or that have a fresh cache entry), and the tickers of peers
+    that still need a full page fetch. Settled rows are cached as partial records.
+    """
+    from cache import PARTIAL_SOURCE
+    from peers import peer_ticker
+    
+    # Search often returns the consolidated URL while peer links are standalone,
+    # so companies are matched by symbol rather than by URL
+    seen = {(peer_ticker(r['url']) or '').upper() for r in seed_results if r['status'] == 'ok'}
+    results = []
+    undecided = []
+    for seed in seed_results:
+        for peer in seed.get('peers', []):
+            ticker = peer_ticker(peer['url'])
+            if not ticker or ticker.upper() in seen:
+                continue
+            seen.add(ticker.upper())
+            if company_index is not None:
+                # Undecided peers are fetched by symbol; keep that lookup off the network
+                company_index.add(peer['url'], [peer['name']], overwrite=False)
+            
+            full = cache.find(ticker) if cache and not refresh else None
+            financial_data = full['financial_data'] if full else peer['financial_data']
+            analysis = analyzer.analyze_stock(financial_data)
+            if not full:
+                if not analyzer.verdict_decided(financial_data, analysis):
+                    undecided.append(ticker)
+                    continue
+                existing = cache.find(ticker, max_age=float('inf'), include_partial=True) if cache else None
+                if cache and (existing is None or existing['fetch_source'] == PARTIAL_SOURCE):
+                    cache.put(peer['url'], None, financial_data, PARTIAL_SOURCE)
+            
+            results.append({
+                'ticker': ticker,
+                'status': 'ok',
+                'url': peer['url'],
+                'fetch_source': 'cache' if full else PARTIAL_SOURCE,
+                'financial_data': financial_data,
+                'analysis': analysis,
+                'peer': True,
+                'seconds': 0.0,
+            })
+    return results, undecided
+
+def run_peer_sweep(tickers, workers=8, browser_workers=2, cache=None, company_index=None,
+                   refresh=False, on_result=None, incremental=False):
+    """Analyze tickers and every peer on their pages, loading full pages only for undecided peers"""
+    start = time.perf_counter()
+    # Both phases share one pool, so the sweep starts Chrome at most browser_workers times
+    driver_pool = new_batch_pool(browser_workers)
+    batch = dict(workers=workers, cache=cache, company_index=company_index, refresh=refresh,
+                 on_result=on_result, incremental=incremental, driver_pool=driver_pool)
+    try:
+        seeds, _ = run_batch(tickers, with_peers=True, **batch)
+        
+        peer_results, undecided = harvest_peers(seeds, StockAnalyzer(), cache, company_index, refresh)
+        for result in peer_results:
+            if on_result:
+                on_result(result)
+        
+        fetched = []
+        if undecided:
+            fetched, _ = run_batch(undecided, **batch)
+            for result in fetched:
+                result['peer'] = True
+    finally:
+        driver_pool.close()
+    return seeds + peer_results + fetched, time.perf_counter() - start
+
+def add_ai_analysis(results, advisor, on_result=None):
+    """Attach AI analysis to every analyzed result, several stocks per AI call"""
+    by_ticker = {r['ticker']: r for r in results}
+    stocks = [
+        (r['ticker'], r['financial_data'], r['analysis'])
+        for r in results if r['status'] == 'ok'
+    ]
+    for ticker, ai_result in advisor.iter_batch_analysis(stocks):
+        by_ticker[ticker]['ai'] = ai_result
+        if on_result:
+            on_result(by_ticker[ticker])
+
+def changed_results(results):
+    """Analyzed results whose page changed (all of them outside incremental mode)"""
+    return [r for r in results if r['status'] == 'ok' and r.get('changed', True)]
+
+def save_snapshot(results, analyzer=None, directory=SNAPSHOT_DIR):
+    """Merge the analyzed results into a new latest columnar snapshot; returns its path or None"""
+    from snapshot_store import merge_with_latest, results_to_frame, write_snapshot
+    
+    frame = results_to_frame(results)
+    if frame.empty:
+        return None
+    frame = merge_with_latest(frame, directory)
+    analysis = (analyzer or StockAnalyzer()).analyze_frame(frame)
+    return write_snapshot(frame, analysis, directory=directory)
+
+def format_ai_result(result):
+    """One-line quick advice for a ticker"""
+    return f"{result['ticker']:<15} 💡 {result['ai']['quick_advice']}"
+
+def print_batch_summary(results, elapsed):
+    """Print per-ticker wall time and aggregate throughput"""
+    print("\n" + "=" * 60)
+    print("⏱️ PER-TICKER WALL TIME")
+    print("=" * 60)
+    for result in results:
+        print(f"  {result['ticker']:<15} {result['status']:<10} {result['seconds']:6.2f}s")
+    
+    ok = sum(1 for r in results if r['status'] == 'ok')
+    rate = len(results) / elapsed * 60 if elapsed > 0 else 0
+    print("=" * 60)
+    print(f"📊 {len(results)} tickers ({ok} analyzed) in {elapsed:.1f}s "
+          f"- {rate:.1f} tickers/min")
+    
+    if any('changed' in r for r in results):
+        changed = [r['ticker'] for r in changed_results(results)]
+        print(f"🔄 {len(changed)}/{ok} pages changed since last fetch"
+              + (f": {', '.join(changed)}" if changed else ""))
+    
+    peers = [r for r in results if r.get('peer')]
+    if peers:
+        from_table = sum(1 for r in peers if r.get('fetch_source') == 'peers')
+        print(f"👥 {len(peers)} peers: {from_table} scored from peer tables, "
+              f"{len(peers) - from_table} from full pages")
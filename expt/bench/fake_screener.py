@@ -0,0 +1,151 @@
+"""
+Local stand-in for screener.in serving recorded pages, with latency and error injection
+
+Run with: python bench/fake_screener.py --port 8765 --latency 0.05 --error-rate 0.02
+then point the tool at it with SCREENER_BASE_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import html
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Recorded pages: <TICKER>.html if present, otherwise company.html for every ticker;
+# peers.html (if present) answers every peers fragment request
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+COMPANY_PATH_RE = re.compile(r'^/company/([^/]+)/(?:consolidated/)?$')
+PEERS_PATH_RE = re.compile(r'^/api/company/\d+/peers/$')
+
+class FakeScreener:
+    """Threaded HTTP server answering search and company page requests"""
+
+    def __init__(self, pages_dir=PAGES_DIR, latency=0.0, jitter=0.0, error_rate=0.0,
+                 seed=None, host='127.0.0.1', port=0):
+        self.pages_dir = pages_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'errors': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread; returns the base URL"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def page(self, ticker):
+        """Recorded HTML for a ticker, cached after the first read"""
+        name = ticker.upper()
+        if name not in self._pages:
+            path = os.path.join(self.pages_dir, f'{name}.html')
+            if not os.path.exists(path):
+                path = os.path.join(self.pages_dir, 'company.html')
+            with open(path, encoding='utf-8') as f:
+                self._pages[name] = f.read()
+        return self._pages[name]
+
+    def peers(self):
+        """Recorded peers fragment, or None if the pages directory has none"""
+        if 'peers' not in self._pages:
+            path = os.path.join(self.pages_dir, 'peers.html')
+            self._pages['peers'] = None
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    self._pages['peers'] = f.read()
+        return self._pages['peers']
+
+    def _delay_and_fail(self):
+        """Sleep the injected latency; True if this request should fail"""
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.stats['errors'] += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _handler_class(self):
+        screener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if screener._delay_and_fail():
+                    return self._send(503, 'Service Unavailable')
+                
+                url = urlsplit(self.path)
+                if url.path.rstrip('/') == '/search':
+                    query = parse_qs(url.query).get('q', [''])[0].strip()
+                    if not query:
+                        return self._send(200, '<html><body></body></html>')
+                    ticker = re.sub(r'\W+', '', query).upper()
+                    return self._send(200, f'<html><body><a href="/company/{ticker}/">{html.escape(query)}</a></body></html>')
+                
+                match = COMPANY_PATH_RE.match(url.path)
+                if match:
+                    return self._send(200, screener.page(match.group(1)))
+                if PEERS_PATH_RE.match(url.path) and screener.peers() is not None:
+                    return self._send(200, screener.peers())
+                self._send(404, 'Not Found')
+
+            def _send(self, status, body):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local screener.in stand-in for benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', default=PAGES_DIR, help="Directory of recorded <TICKER>.html pages")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    
+    screener = FakeScreener(args.pages, args.latency, args.jitter, args.error_rate, args.seed, args.host, args.port)
+    print(f"Serving on {screener.base_url} (SCREENER_BASE_URL={screener.base_url})")
+    try:
+        screener.serve_forever()
+    except KeyboardInterrupt:
+        screener.stop()
+
+if __name__ == "__main__":
+    main()
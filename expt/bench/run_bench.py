@@ -0,0 +1,200 @@
+"""
+Offline benchmarks of the fetch/parse/score pipeline against a local screener.in stand-in
+
+Run with: python bench/run_bench.py --concurrency 1,4,16 --requests 200 --latency 0.02 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_screener import FakeScreener, PAGES_DIR
+
+try:
+    import psutil
+except ImportError:  # peak RSS falls back to the process high-water mark
+    psutil = None
+
+SCENARIOS = ['search', 'extract', 'analyze', 'pipeline']
+
+class NoBrowserPool:
+    """Driver pool stand-in that refuses to start Chrome, so fallbacks count as errors"""
+
+    def acquire(self, timeout=None):
+        raise RuntimeError("browser fallback disabled in benchmarks")
+
+class RSSSampler:
+    """Background thread tracking this process's peak resident memory in MB"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak_mb = self._current_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._current_mb())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self._current_mb())
+
+    def _current_mb(self):
+        if psutil is not None:
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentiles(latencies):
+    """p50/p95/p99 in milliseconds"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    return {
+        f'p{p}_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+        for p in (50, 95, 99)
+    }
+
+def make_operation(scenario, transport, base_url):
+    """Function running one operation of a scenario; returns True on success"""
+    # Imported here so SCREENER_BASE_URL is already pointing at the stand-in
+    from data_fetcher import StockDataFetcher
+    from stock_analyzer import StockAnalyzer
+    
+    analyzer = StockAnalyzer()
+    
+    def fetcher():
+        return StockDataFetcher(driver_pool=NoBrowserPool(), session=transport, verbose=False)
+    
+    if scenario == 'search':
+        return lambda i: fetcher().search_stock(f"BENCH{i}") is not None
+    if scenario == 'extract':
+        return lambda i: bool(fetcher().extract_financial_data(f"{base_url}/company/BENCH{i}/"))
+    if scenario == 'analyze':
+        financial_data = fetcher().extract_financial_data(f"{base_url}/company/BENCH/")
+        return lambda i: analyzer.analyze_stock(financial_data)['verdict'] is not None
+    if scenario == 'pipeline':
+        def pipeline(i):
+            stock_data = fetcher().get_stock_data(f"BENCH{i}", refresh=True)
+            return bool(stock_data) and analyzer.analyze_stock(stock_data['financial_data']) is not None
+        return pipeline
+    raise ValueError(f"Unknown scenario {scenario!r}; choose from {SCENARIOS}")
+
+def run_scenario(operation, requests, concurrency):
+    """Run `requests` operations on `concurrency` threads and summarize them"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    
+    def timed(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = operation(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+    
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(requests)))
+        elapsed = time.perf_counter() - start
+    
+    result = {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(requests / elapsed, 3) if elapsed > 0 else None,
+    }
+    result.update(percentiles(latencies))
+    result['peak_rss_mb'] = round(rss.peak_mb, 1)
+    return result
+
+def run_benchmarks(args):
+    screener = None
+    base_url = args.base_url
+    if not base_url:
+        screener = FakeScreener(args.pages, args.latency, args.jitter, args.error_rate, args.seed)
+        base_url = screener.start()
+    os.environ['SCREENER_BASE_URL'] = base_url
+    
+    from http_transport import HTTPTransport
+    
+    concurrency_levels = [int(c) for c in args.concurrency.split(',')]
+    # The benchmark measures the pipeline, not the production rate limit
+    transport = HTTPTransport(
+        pool_size=max(concurrency_levels), max_per_host=max(concurrency_levels),
+        requests_per_minute=0, backoff=0.05
+    )
+    
+    results = []
+    try:
+        for scenario in args.scenarios.split(','):
+            operation = make_operation(scenario, transport, base_url)
+            for concurrency in concurrency_levels:
+                result = run_scenario(operation, args.requests, concurrency)
+                result['scenario'] = scenario
+                results.append(result)
+                print(f"{scenario:<10} x{concurrency:<3} p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                      f"{result['throughput_per_second']}/s errors={result['errors']}", file=sys.stderr)
+    finally:
+        if screener:
+            screener.stop()
+    
+    return {
+        'meta': {
+            'base_url': base_url,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'http': transport.stats(),
+            'server': screener.stats if screener else None,
+        },
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma separated, from {SCENARIOS}")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma separated thread counts")
+    parser.add_argument('--requests', type=int, default=200, help="Operations per scenario and concurrency level")
+    parser.add_argument('--latency', type=float, default=0.02, help="Injected server latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of server responses that are 503")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--pages', default=PAGES_DIR, help="Directory of recorded <TICKER>.html pages")
+    parser.add_argument('--base-url', help="Use an already running stand-in instead of starting one")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    
+    report = json.dumps(run_benchmarks(args), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
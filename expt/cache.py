@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from config import (
+    CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_MB,
+    AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES
+)
+
+_shared_cache = None
+_shared_response_cache = None
+_shared_cache_lock = threading.Lock()
+
+# Per-request tokens that change on every download of an otherwise identical page
+VOLATILE_RE = re.compile(
+    r'<input[^>]*csrfmiddlewaretoken[^>]*>|<meta[^>]*csrf[^>]*>|\snonce="[^"]*"|csrftoken=[\w-]+'
+)
+
+# fetch_source of partial records harvested from another company's peer table
+PARTIAL_SOURCE = 'peers'
+
+def page_hash(html):
+    """Content hash of a page, ignoring per-request tokens"""
+    return hashlib.sha256(VOLATILE_RE.sub('', html or '').encode('utf-8')).hexdigest()
+
+def _url_symbol(url):
+    """Uppercase symbol of a /company/<symbol>/ URL, or None"""
+    match = re.search(r'/company/([^/]+)/', url or '')
+    return match.group(1).upper() if match else None
+
+def _connect(path):
+    """Open a SQLite database shareable across threads, creating its directory"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+class FetchCache:
+    """SQLite cache of company pages and their parsed financial data, keyed by URL"""
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_mb=CACHE_MAX_MB):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS company_pages (
+                url TEXT PRIMARY KEY,
+                html TEXT,
+                financial_data TEXT NOT NULL,
+                fetch_source TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT
+            )
+        """)
+        # Caches created before conditional refresh lack the validator columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(company_pages)")}
+        for column in ('etag', 'last_modified', 'content_hash'):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE company_pages ADD COLUMN {column} TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_company_pages_accessed ON company_pages (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, url, max_age=None, include_partial=False):
+        """Return the cached entry for url, or None if it is missing or older than the TTL.
+        
+        Partial peer-table records count as missing unless include_partial=True.
+        """
+        max_age = self.ttl_seconds if max_age is None else max_age
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html, financial_data, fetch_source, fetched_at, etag, last_modified, content_hash "
+                "FROM company_pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None or now - row[3] > max_age or (row[2] == PARTIAL_SOURCE and not include_partial):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE company_pages SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+            self.hits += 1
+        
+        return {
+            'url': url,
+            'html': row[0],
+            'financial_data': json.loads(row[1]),
+            'fetch_source': row[2],
+            'fetched_at': row[3],
+            'etag': row[4],
+            'last_modified': row[5],
+            'content_hash': row[6],
+        }
+
+    def find(self, symbol, max_age=None, include_partial=False):
+        """Cached entry for a company symbol under any of its URLs (standalone or consolidated).
+        
+        Full records win over partial ones, then the most recently fetched.
+        """
+        symbol = (symbol or '').strip().upper()
+        if not symbol:
+            return None
+        pattern = '%/company/' + re.sub(r'([%_\\])', r'\\\1', symbol) + '/%'
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, fetch_source, fetched_at FROM company_pages WHERE url LIKE ? ESCAPE '\\'",
+                (pattern,)
+            ).fetchall()
+        rows = [r for r in rows if _url_symbol(r[0]) == symbol]
+        rows.sort(key=lambda r: (r[1] != PARTIAL_SOURCE, r[2]), reverse=True)
+        for url, _, _ in rows:
+            entry = self.get(url, max_age=max_age, include_partial=include_partial)
+            if entry:
+                return entry
+        return None
+
+    def put(self, url, html, financial_data, fetch_source=None, etag=None, last_modified=None,
+            content_hash=None):
+        """Store a fetched page and its parsed data, evicting least recently used entries.
+        
+        content_hash defaults to page_hash(html). A browser-rendered DOM never
+        matches the static GET bodies revalidation compares against, so it is
+        not hashed; pass the static body's hash instead.
+        """
+        if content_hash is None and html and fetch_source != 'browser':
+            content_hash = page_hash(html)
+        payload = json.dumps(financial_data)
+        size = len(html or '') + len(payload)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO company_pages "
+                "(url, html, financial_data, fetch_source, fetched_at, accessed_at, size, "
+                "etag, last_modified, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, html, payload, fetch_source, now, now, size,
+                 etag, last_modified, content_hash)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Mark an entry as freshly fetched after the server confirmed it is unchanged"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE company_pages SET fetched_at = ?, accessed_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (now, now, etag, last_modified, url)
+            )
+            self._conn.commit()
+
+    def iter_financial_data(self, include_partial=False):
+        """Yield (url, financial_data) for every cached company, expired or not"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, financial_data FROM company_pages "
+                "WHERE fetch_source IS NULL OR fetch_source != ? OR ?",
+                (PARTIAL_SOURCE, include_partial)
+            ).fetchall()
+        for url, payload in rows:
+            yield url, json.loads(payload)
+
+    def invalidate(self, url):
+        """Drop one entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM company_pages WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM company_pages")
+            self._conn.commit()
+
+    def stats(self):
+        """Entry count, stored bytes and hit/miss counters"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM company_pages"
+            ).fetchone()
+        return {'entries': entries, 'bytes': total, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        """Delete least recently used rows until the cache fits in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM company_pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT url, size FROM company_pages ORDER BY accessed_at ASC"
+        ).fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM company_pages WHERE url = ?", (url,))
+            total -= size
+
+class ResponseCache:
+    """Content-addressed SQLite cache of LLM responses, keyed by a hash of model and prompt"""
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=AI_CACHE_TTL_SECONDS, max_entries=AI_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ai_responses_accessed ON ai_responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt):
+        """SHA-256 of the model name and the exact prompt text"""
+        return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, model, prompt):
+        """Cached response text, or None on a miss or once the TTL has passed"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM ai_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE ai_responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0]
+
+    def put(self, model, prompt, response):
+        """Store a response, evicting least recently used entries past max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_responses VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(model, prompt), model, response, now, now)
+            )
+            self._conn.execute("""
+                DELETE FROM ai_responses WHERE key IN (
+                    SELECT key FROM ai_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ai_responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ai_responses").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def get_shared_cache():
+    """Process-wide FetchCache, opened on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = FetchCache()
+        return _shared_cache
+
+def get_response_cache():
+    """Process-wide ResponseCache, opened on first use"""
+    global _shared_response_cache
+    with _shared_cache_lock:
+        if _shared_response_cache is None:
+            _shared_response_cache = ResponseCache()
+        return _shared_response_cache
@@ -0,0 +1,210 @@
+"""
+Local symbol/name -> Screener company URL index
+"""
+
+import bisect
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+from config import SCREENER_BASE_URL, COMPANY_INDEX_PATH
+
+# Tokens that don't help tell companies apart
+STOP_WORDS = {'LTD', 'LIMITED', 'THE', 'CO', 'COMPANY', 'CORP', 'CORPORATION', 'INC', 'PVT', 'PRIVATE'}
+
+# Shortest query that may resolve by prefix (short ones like "ITC" are too ambiguous)
+PREFIX_MIN_LENGTH = 5
+
+# Minimum trigram Jaccard similarity for a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.6
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+def normalize_name(text):
+    """Uppercase, drop punctuation and filler words like LTD, and remove spaces"""
+    text = (text or '').upper().replace('&', ' AND ')
+    tokens = re.findall(r'[A-Z0-9]+', text)
+    tokens = [t for t in tokens if t not in STOP_WORDS] or tokens
+    return ''.join(tokens)
+
+def company_path(url):
+    """Reduce a company URL to its /company/<symbol>/[consolidated/] path"""
+    match = re.search(r'/company/[^/]+/(?:consolidated/)?', urlparse(url).path or url)
+    return match.group(0) if match else None
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CompanyIndex:
+    """Company URLs by symbol or name, persisted in SQLite.
+    
+    Only exact alias matches are authoritative (lookup); prefix and trigram-fuzzy
+    matches are candidates an online search has to confirm (candidate).
+    """
+
+    def __init__(self, path=COMPANY_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._sorted_keys = []
+        self._trigram_keys = defaultdict(set)
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS company_aliases (
+                alias TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        
+        for alias, path in self._conn.execute("SELECT alias, path FROM company_aliases"):
+            self._index_alias(alias, path)
+        self._sorted_keys.sort()
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, url, names=(), overwrite=True):
+        """Map a company URL, its symbol and any extra names/aliases to each other"""
+        path = company_path(url)
+        if not path:
+            return
+        symbol = path.split('/')[2]
+        keys = {normalize_name(n) for n in (symbol,) + tuple(names)}
+        keys.discard('')
+        
+        with self._lock:
+            new_keys = [
+                k for k in keys
+                if self._exact.get(k) != path and (overwrite or k not in self._exact)
+            ]
+            if not new_keys:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO company_aliases (alias, path) VALUES (?, ?)",
+                [(k, path) for k in new_keys]
+            )
+            self._conn.commit()
+            for key in new_keys:
+                if key not in self._exact:
+                    bisect.insort(self._sorted_keys, key)
+                self._index_alias(key, path)
+
+    def lookup(self, query):
+        """Resolve a symbol or known company name (exact alias match) to a full URL, or None"""
+        key = normalize_name(query)
+        if not key:
+            return None
+        
+        with self._lock:
+            path = self._exact.get(key)
+        return SCREENER_BASE_URL + path if path else None
+
+    def candidate(self, query, fuzzy=True):
+        """Likely URL for an unknown name by unique prefix or trigram similarity, or None.
+        
+        A near-miss name can belong to a different company, so callers confirm
+        candidates with an online search before using them.
+        """
+        key = normalize_name(query)
+        if not key:
+            return None
+        
+        with self._lock:
+            path = self._prefix_match(key)
+            if not path and fuzzy:
+                path = self._fuzzy_match(key)
+        return SCREENER_BASE_URL + path if path else None
+
+    def import_csv(self, csv_path):
+        """Bulk load an NSE (SYMBOL, NAME OF COMPANY) or BSE (Security Id, Security Name) list"""
+        count = 0
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                row = {k.strip().upper(): (v or '').strip() for k, v in row.items() if k}
+                symbol = row.get('SYMBOL') or row.get('SECURITY ID')
+                name = row.get('NAME OF COMPANY') or row.get('SECURITY NAME') or row.get('ISSUER NAME')
+                code = row.get('SECURITY CODE')
+                if not symbol:
+                    continue
+                aliases = [n for n in (name, code) if n]
+                # Don't clobber URLs already learned from live searches
+                self.add(f"/company/{symbol}/", aliases, overwrite=False)
+                count += 1
+        return count
+
+    def _index_alias(self, key, path):
+        self._exact[key] = path
+        for gram in _trigrams(key):
+            self._trigram_keys[gram].add(key)
+
+    def _prefix_match(self, key):
+        """Path for a query that is a prefix of aliases of exactly one company"""
+        if len(key) < PREFIX_MIN_LENGTH:
+            return None
+        start = bisect.bisect_left(self._sorted_keys, key)
+        paths = set()
+        for candidate in self._sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            paths.add(self._exact[candidate])
+            if len(paths) > 1:
+                return None
+        return paths.pop() if paths else None
+
+    def _fuzzy_match(self, key):
+        """Path of the alias with the highest trigram similarity above the threshold"""
+        grams = _trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_keys.get(gram, ()):
+                shared[candidate] += 1
+        
+        best_key, best_score = None, FUZZY_MIN_SIMILARITY
+        for candidate, count in shared.items():
+            score = count / (len(grams) + len(_trigrams(candidate)) - count)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        return self._exact[best_key] if best_key else None
+
+def get_company_index():
+    """Process-wide CompanyIndex, loaded on first use"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = CompanyIndex()
+        return _shared_index
+
+def main():
+    """Command line: import a symbol list or look a name up"""
+    if len(sys.argv) < 3 or sys.argv[1] not in ('import', 'lookup'):
+        print("Usage: python company_index.py import EQUITY_L.csv | lookup NAME")
+        return
+    
+    index = get_company_index()
+    if sys.argv[1] == 'import':
+        count = index.import_csv(sys.argv[2])
+        print(f"✅ Imported {count} companies ({len(index)} aliases indexed)")
+    else:
+        query = ' '.join(sys.argv[2:])
+        url = index.lookup(query)
+        candidate = None if url else index.candidate(query)
+        if url:
+            print(url)
+        elif candidate:
+            print(f"{candidate} (unconfirmed candidate)")
+        else:
+            print("❌ Not found")
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,9 @@ load_dotenv()
 # API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-# Screener.in Configuration
-SCREENER_BASE_URL = "https://www.screener.in"
-SCREENER_SEARCH_URL = "https://www.screener.in/search/"
+# Screener.in Configuration (base URL can point at bench/fake_screener.py for offline runs)
+SCREENER_BASE_URL = os.getenv('SCREENER_BASE_URL', "https://www.screener.in").rstrip('/')
+SCREENER_SEARCH_URL = f"{SCREENER_BASE_URL}/search/"
 
 # Stock Analysis Criteria
 STOCK_CRITERIA = {
@@ -22,5 +22,83 @@ STOCK_CRITERIA = {
     'intrinsic_value_multiplier': 22.5
 }
 
+# Headless browser pool
+DRIVER_POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', '2'))
+DRIVER_MAX_PAGES = int(os.getenv('DRIVER_MAX_PAGES', '50'))
+DRIVER_MAX_RSS_MB = int(os.getenv('DRIVER_MAX_RSS_MB', '1024'))
+
+# chromedriver binary; unset means PATH, then webdriver-manager (resolved once per process)
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH')
+# Resources the browser never needs to read the financial tables
+DRIVER_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*clarity.ms*',
+]
+
+# Shared HTTP transport: connection pool, per-host concurrency, rate limit, retries, timeouts
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '8'))
+HTTP_REQUESTS_PER_MINUTE = float(os.getenv('HTTP_REQUESTS_PER_MINUTE', '240'))
+HTTP_BURST = int(os.getenv('HTTP_BURST', '8'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_SECONDS = float(os.getenv('HTTP_BACKOFF_SECONDS', '0.5'))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv('HTTP_BACKOFF_MAX_SECONDS', '30'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '15'))
+
+# HTTP API service
+API_HOST = os.getenv('API_HOST', '0.0.0.0')
+API_PORT = int(os.getenv('API_PORT', '8000'))
+API_WORKERS = int(os.getenv('API_WORKERS', '16'))
+
+# On-disk cache of fetched company pages
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'screener_cache.sqlite3'))
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', '200'))
+
+# Columnar snapshots of analysed batches, one .npy file per metric
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'snapshots'))
+SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '5'))
+
+# Pipeline metrics; set METRICS_JSONL_PATH to also log every finished span as a JSON line
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_JSONL_PATH = os.getenv('METRICS_JSONL_PATH')
+
+# AI backend: 'gemini', or 'stub' for an offline model with simulated latency/failures
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini').lower()
+STUB_LATENCY = float(os.getenv('STUB_LATENCY', '0.5'))
+STUB_FAILURE_RATE = float(os.getenv('STUB_FAILURE_RATE', '0.0'))
+
+# Async AI scheduler limits
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '60'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+LLM_BACKOFF_SECONDS = float(os.getenv('LLM_BACKOFF_SECONDS', '1'))
+
+# Ask for insights and quick advice in a single AI call
+AI_COMBINED_MODE = os.getenv('AI_COMBINED_MODE', 'true').lower() in ('1', 'true', 'yes')
+
+# Size budget for prompts packing several stocks into one AI call
+AI_BATCH_PROMPT_CHARS = int(os.getenv('AI_BATCH_PROMPT_CHARS', '12000'))
+
+# Cache of AI responses, keyed by model + prompt
+AI_CACHE_TTL_SECONDS = int(os.getenv('AI_CACHE_TTL_SECONDS', str(7 * 24 * 60 * 60)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '5000'))
+
+# Local symbol/name -> company URL index
+COMPANY_INDEX_PATH = os.getenv('COMPANY_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'company_index.sqlite3'))
+
+# How long the Streamlit app reuses a ticker's analysis and AI output
+WEB_RESULT_TTL_SECONDS = int(os.getenv('WEB_RESULT_TTL_SECONDS', str(15 * 60)))
+
+# Interactive session: tickers prefetched ahead (recent history at startup, the
+# rest of a queue as you go), where the history is kept and how many names it holds
+SESSION_PREFETCH = int(os.getenv('SESSION_PREFETCH', '3'))
+SESSION_HISTORY_PATH = os.getenv('SESSION_HISTORY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'session_history.txt'))
+SESSION_HISTORY_MAX = int(os.getenv('SESSION_HISTORY_MAX', '100'))
+
 # User Agent for web scraping
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36" 
\ No newline at end of file
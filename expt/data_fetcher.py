@@ -1,62 +1,194 @@
-import requests
+import atexit
 import re
-import time
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from config import SCREENER_BASE_URL, SCREENER_SEARCH_URL, USER_AGENT
+import shutil
+import threading
+from config import (
+    SCREENER_BASE_URL, SCREENER_SEARCH_URL, USER_AGENT,
+    DRIVER_POOL_SIZE, DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB,
+    CHROMEDRIVER_PATH, DRIVER_BLOCKED_URLS
+)
+import metrics
+from driver_pool import DriverPool
+from company_index import normalize_name
+from cache import page_hash
+
+# bs4/lxml, requests (http_transport), numpy (financial_tables) and selenium are
+# imported where they are used, so importing this module stays cheap
+
+# Page labels for each metric, in order of preference
+METRIC_LABELS = {
+    'roe': ['ROE'],
+    'pe_ratio': ['Stock P/E', 'P/E'],
+    'debt_to_equity': ['Debt to equity'],
+    'roce': ['ROCE'],
+    'eps_growth': ['EPS Growth'],
+    'peg': ['PEG Ratio', 'PEG'],
+    'eps': ['EPS', 'EPS in Rs'],
+    'book_value': ['Book Value'],
+    'cash_flow': ['Cash Flow', 'Cash from Operating Activity'],
+}
+
+# Metrics shown in the top ratios card of every company page; if the static
+# HTML lacks the card or any of their labels the page needs a real browser.
+# A label with a blank value (e.g. Stock P/E of a loss-making company) is
+# complete: Chrome would render the same blank
+STATIC_REQUIRED_METRICS = ('roe', 'pe_ratio', 'roce', 'book_value')
+
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+def resolve_chromedriver_path():
+    """chromedriver binary to use, looked up once per process.
+    
+    CHROMEDRIVER_PATH wins, then a chromedriver on PATH, then webdriver-manager
+    (which checks versions and may download). None lets Selenium locate it.
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            path = CHROMEDRIVER_PATH or shutil.which('chromedriver')
+            if not path:
+                try:
+                    from webdriver_manager.chrome import ChromeDriverManager
+                    path = ChromeDriverManager().install()
+                except Exception as e:
+                    print(f"webdriver-manager could not install chromedriver: {e}")
+            _chromedriver_path = path or ''
+        return _chromedriver_path or None
+
+def create_chrome_driver():
+    """Start a headless Chrome driver tuned for reading the DOM only"""
+    # Selenium is only imported once a browser is actually needed
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    # Return from get() at DOMContentLoaded; callers wait for the elements they need
+    chrome_options.page_load_strategy = 'eager'
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.stylesheets': 2,
+        'profile.managed_default_content_settings.fonts': 2,
+    })
+    
+    service = Service(resolve_chromedriver_path())
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    
+    # Prefs don't cover fonts, CSS or trackers everywhere; block them at the network layer
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': DRIVER_BLOCKED_URLS})
+    except Exception as e:
+        print(f"Could not set blocked URLs on Chrome: {e}")
+    return driver
+
+def get_driver_pool():
+    """Process-wide pool of warm Chrome drivers, created on first use"""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(
+                create_chrome_driver,
+                max_size=DRIVER_POOL_SIZE,
+                max_pages=DRIVER_MAX_PAGES,
+                max_rss_mb=DRIVER_MAX_RSS_MB
+            )
+            atexit.register(_driver_pool.close)
+        return _driver_pool
 
 class StockDataFetcher:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': USER_AGENT})
+    def __init__(self, driver_pool=None, cache=None, company_index=None, session=None,
+                 single_flight=None, verbose=True):
+        from http_transport import get_transport
+        
+        # Every fetcher shares one pooled, rate-limited transport unless given a session
+        self.session = session if session is not None else get_transport()
+        self.driver_pool = driver_pool
+        self.cache = cache
+        self.company_index = company_index
+        self.single_flight = single_flight
+        self.verbose = verbose
         self.driver = None
+        self.pages_loaded = 0
+        self.last_fetch_source = None
+        self.last_page_html = None
+        self.last_static_html = None
+        self.last_validators = (None, None)
         
+    @metrics.timed('driver_acquire')
     def setup_driver(self):
-        """Setup Chrome driver for dynamic content"""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument(f"--user-agent={USER_AGENT}")
-        
-        # Debug: print the chromedriver path
-        chromedriver_path = ChromeDriverManager().install()
-        print(f"[DEBUG] ChromeDriverManager().install() returned: {chromedriver_path}")
-        # Use the correct binary path explicitly
-        chromedriver_path = "/home/jairaj/.wdm/drivers/chromedriver/linux64/133.0.6943.141/chromedriver-linux64/chromedriver"
-        print(f"[DEBUG] Using chromedriver binary: {chromedriver_path}")
-        service = Service(chromedriver_path)
-        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        """Setup Chrome driver for dynamic content, borrowing from the pool if there is one"""
+        if self.driver_pool:
+            self.driver = self.driver_pool.acquire()
+        else:
+            self.driver = create_chrome_driver()
+        self.pages_loaded = 0
         
+    @metrics.timed('search')
     def search_stock(self, stock_name):
         """Search for stock and get the first result"""
+        # Known names resolve locally; only unknown ones go to the network
+        candidate = None
+        if self.company_index is not None:
+            stock_url = self.company_index.lookup(stock_name)
+            if stock_url:
+                metrics.count('company_index_lookups', result='hit')
+                return stock_url
+            # A prefix or fuzzy match may be a different company: the online search
+            # wins, and the candidate only stands in for the slow browser search
+            candidate = self.company_index.candidate(stock_name)
+            metrics.count('company_index_lookups', result='candidate' if candidate else 'miss')
+        
+        stock_url = self._search_static(stock_name)
+        if not stock_url and candidate:
+            metrics.count('company_index_candidates', result='used')
+            return candidate
+        if not stock_url:
+            stock_url = self._search_browser(stock_name)
+        if stock_url and self.company_index is not None:
+            self.company_index.add(stock_url, [stock_name])
+        return stock_url
+    
+    def _search_static(self, stock_name):
+        """First company URL from a plain GET of the search page, or None"""
         try:
-            # First try with requests
-            search_url = f"{SCREENER_SEARCH_URL}?q={stock_name}"
-            response = self.session.get(search_url)
-            
+            response = self.session.get(f"{SCREENER_SEARCH_URL}?q={stock_name}")
             if response.status_code == 200:
+                from bs4 import BeautifulSoup
                 soup = BeautifulSoup(response.content, 'html.parser')
                 
                 # Look for stock links in search results
                 stock_links = soup.find_all('a', href=re.compile(r'/company/'))
                 
                 if stock_links:
-                    stock_url = SCREENER_BASE_URL + stock_links[0]['href']
-                    return stock_url
-                    
-            # If requests fail, use Selenium
+                    return SCREENER_BASE_URL + stock_links[0]['href']
+        except Exception as e:
+            print(f"Error searching for stock {stock_name}: {e}")
+        return None
+    
+    def _search_browser(self, stock_name):
+        """First company URL from the search page rendered in Chrome, or None"""
+        try:
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
+            
+            metrics.count('browser_fallbacks', stage='search')
             if not self.driver:
                 self.setup_driver()
                 
-            self.driver.get(search_url)
-            time.sleep(2)
+            self.driver.get(f"{SCREENER_SEARCH_URL}?q={stock_name}")
+            self.pages_loaded += 1
             
             # Wait for search results
             wait = WebDriverWait(self.driver, 10)
@@ -71,108 +203,220 @@ class StockDataFetcher:
             print(f"Error searching for stock {stock_name}: {e}")
             return None
     
-    def extract_financial_data(self, stock_url):
-        """Extract financial data from stock page"""
+    @metrics.timed('extract')
+    def extract_financial_data(self, stock_url, html=None):
+        """Extract financial data from stock page, or from its already fetched HTML"""
+        self.last_fetch_source = None
+        self.last_page_html = None
+        
+        # Company pages are server-rendered, so try a plain GET before launching Chrome
+        if html is None:
+            html = self._fetch_static_page(stock_url)
+        # Revalidation compares static GET bodies, so keep this one even if Chrome takes over
+        self.last_static_html = html
+        if html:
+            data, top_labels = self._parse_page(html)
+            if self._is_complete(top_labels):
+                self.last_fetch_source = 'static'
+                self.last_page_html = html
+                return data
+            print(f"Static parse incomplete for {stock_url}, falling back to browser")
+        
+        metrics.count('browser_fallbacks', stage='extract', reason='incomplete' if html else 'fetch_failed')
+        return self._extract_with_browser(stock_url)
+    
+    @metrics.timed('fetch_static')
+    def _fetch_static_page(self, stock_url):
+        """Fetch the company page HTML without a browser"""
+        try:
+            response = self.session.get(stock_url)
+            if response.status_code == 200:
+                self.last_validators = self._response_validators(response)
+                return response.text
+            print(f"Static fetch of {stock_url} returned HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Static fetch of {stock_url} failed: {e}")
+        return None
+    
+    def _response_validators(self, response):
+        """(ETag, Last-Modified) response headers, either may be None"""
+        headers = getattr(response, 'headers', None) or {}
+        return headers.get('ETag'), headers.get('Last-Modified')
+    
+    @metrics.timed('revalidate')
+    def _revalidate(self, stock_url, cached):
+        """Conditional GET of a cached page.
+        
+        Returns (True, None) if the page is unchanged, (False, html) if it
+        changed, or (False, None) if the request failed. Browser-fetched entries
+        carry the validators and hash of the static GET that preceded Chrome;
+        one without them (the static GET failed too) always counts as changed.
+        """
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            response = self.session.get(stock_url, headers=headers)
+        except Exception as e:
+            print(f"Conditional fetch of {stock_url} failed: {e}")
+            return False, None
+        
+        etag, last_modified = self._response_validators(response)
+        if response.status_code == 304:
+            self.cache.touch(stock_url, etag, last_modified)
+            return True, None
+        if response.status_code != 200:
+            return False, None
+        
+        # Servers without validators still send the same content when nothing moved
+        if cached.get('content_hash') and page_hash(response.text) == cached['content_hash']:
+            self.cache.touch(stock_url, etag, last_modified)
+            return True, None
+        self.last_validators = (etag, last_modified)
+        return False, response.text
+    
+    def _is_complete(self, top_labels):
+        """Check that the top ratios card lists every metric each company page renders"""
+        return all(
+            any(self._normalize_label(label) in top_labels for label in METRIC_LABELS[key])
+            for key in STATIC_REQUIRED_METRICS
+        )
+    
+    @metrics.timed('peers')
+    def get_peers(self, stock_url, html=None):
+        """Peer table of a company page as [{'name', 'url', 'financial_data'}].
+        
+        Reads the page from html, the cache or a static GET; when the page only
+        has a placeholder for the table, fetches the peers fragment instead.
+        """
+        if html is None and self.cache:
+            cached = self.cache.get(stock_url, max_age=float('inf'))
+            html = cached['html'] if cached else None
+        if html is None:
+            html = self._fetch_static_page(stock_url)
+        if not html:
+            return []
+        
+        from bs4 import BeautifulSoup
+        from peers import parse_peer_table, peer_fragment_url
+        
+        soup = BeautifulSoup(html, 'lxml')
+        peers = parse_peer_table(soup)
+        fragment_url = None if peers else peer_fragment_url(soup)
+        if fragment_url:
+            metrics.count('peer_fragments')
+            try:
+                response = self.session.get(fragment_url)
+                if response.status_code == 200:
+                    peers = parse_peer_table(response.text)
+                else:
+                    print(f"Peers fetch for {stock_url} returned HTTP {response.status_code}")
+            except Exception as e:
+                print(f"Peers fetch for {stock_url} failed: {e}")
+        return peers
+    
+    @metrics.timed('browser_extract')
+    def _extract_with_browser(self, stock_url):
+        """Extract financial data by rendering the page in Chrome"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        
         try:
             if not self.driver:
                 self.setup_driver()
                 
-            self.driver.get(stock_url)
-            time.sleep(3)
-            
-            # Wait for page to load
-            wait = WebDriverWait(self.driver, 15)
-            
-            # Extract key metrics
-            data = {}
-            
-            # ROE
-            try:
-                roe_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'ROE')]/following-sibling::td"))
-                )
-                data['roe'] = self._extract_number(roe_element.text)
-            except:
-                data['roe'] = None
-                
-            # P/E Ratio
-            try:
-                pe_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'P/E')]/following-sibling::td"))
-                )
-                data['pe_ratio'] = self._extract_number(pe_element.text)
-            except:
-                data['pe_ratio'] = None
+            with metrics.span('page_load'):
+                self.driver.get(stock_url)
+                self.pages_loaded += 1
                 
-            # Debt to Equity
-            try:
-                debt_equity_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'Debt to equity')]/following-sibling::td"))
-                )
-                data['debt_to_equity'] = self._extract_number(debt_equity_element.text)
-            except:
-                data['debt_to_equity'] = None
+                # Wait once for the ratios card, then read the whole DOM in one go
+                try:
+                    WebDriverWait(self.driver, 15).until(
+                        EC.presence_of_element_located((By.ID, "top-ratios"))
+                    )
+                except TimeoutException:
+                    metrics.count('browser_timeouts')
+                    print(f"Timed out waiting for ratios on {stock_url}, parsing what loaded")
                 
-            # ROCE
-            try:
-                roce_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'ROCE')]/following-sibling::td"))
-                )
-                data['roce'] = self._extract_number(roce_element.text)
-            except:
-                data['roce'] = None
-                
-            # EPS Growth
-            try:
-                eps_growth_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'EPS Growth')]/following-sibling::td"))
-                )
-                data['eps_growth'] = self._extract_number(eps_growth_element.text)
-            except:
-                data['eps_growth'] = None
-                
-            # PEG Ratio
-            try:
-                peg_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'PEG')]/following-sibling::td"))
-                )
-                data['peg'] = self._extract_number(peg_element.text)
-            except:
-                data['peg'] = None
-                
-            # EPS
-            try:
-                eps_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'EPS')]/following-sibling::td"))
-                )
-                data['eps'] = self._extract_number(eps_element.text)
-            except:
-                data['eps'] = None
-                
-            # Book Value
-            try:
-                bv_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'Book Value')]/following-sibling::td"))
-                )
-                data['book_value'] = self._extract_number(bv_element.text)
-            except:
-                data['book_value'] = None
-                
-            # Cash Flow (simplified check)
-            try:
-                cf_element = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'Cash Flow')]/following-sibling::td"))
-                )
-                data['cash_flow'] = self._extract_number(cf_element.text)
-            except:
-                data['cash_flow'] = None
-                
-            return data
+            html = self.driver.page_source
+            self.last_fetch_source = 'browser'
+            self.last_page_html = html
+            return self.parse_financial_data(html)
             
         except Exception as e:
+            metrics.count('extract_errors')
             print(f"Error extracting data: {e}")
             return {}
     
+    def parse_financial_data(self, html):
+        """Resolve every metric from a single parse of the page HTML"""
+        return self._parse_page(html)[0]
+    
+    @metrics.timed('parse')
+    def _parse_page(self, html):
+        """(metrics, set of labels in the top ratios card) from a single parse"""
+        index, top_labels = self._build_metric_index(html)
+        data = {
+            key: self._lookup_metric(index, labels)
+            for key, labels in METRIC_LABELS.items()
+        }
+        return data, top_labels
+    
+    def _build_metric_index(self, html):
+        """Build an ordered label -> value text index of top ratios and table rows.
+        
+        Also returns the labels of the top ratios card, blank values included.
+        """
+        from bs4 import BeautifulSoup
+        
+        soup = BeautifulSoup(html, 'lxml')
+        index = []
+        top_labels = set()
+        
+        # Top ratios card: <li><span class="name">ROE</span><span class="number">..</span></li>
+        for item in soup.select('#top-ratios li'):
+            name = item.select_one('.name')
+            value = item.select_one('.number') or item.select_one('.value')
+            if name:
+                top_labels.add(self._normalize_label(name.get_text()))
+            if name and value:
+                index.append((self._normalize_label(name.get_text()), value.get_text()))
+        
+        # Table rows: label in the first cell, latest non-empty value in the last one
+        for row in soup.find_all('tr'):
+            cells = row.find_all('td')
+            if len(cells) < 2:
+                continue
+            values = [c.get_text(strip=True) for c in cells[1:]]
+            values = [v for v in values if v]
+            if values:
+                index.append((self._normalize_label(cells[0].get_text()), values[-1]))
+        
+        return index, top_labels
+    
+    def _lookup_metric(self, index, labels):
+        """Find a metric in the index, preferring exact label matches over substring ones"""
+        for label in labels:
+            wanted = self._normalize_label(label)
+            for name, text in index:
+                if name == wanted:
+                    return self._extract_number(text)
+        for label in labels:
+            wanted = self._normalize_label(label)
+            for name, text in index:
+                if wanted in name:
+                    return self._extract_number(text)
+        return None
+    
+    def _normalize_label(self, text):
+        """Normalize a label for matching (case, whitespace, trailing % and +)"""
+        text = re.sub(r'\s+', ' ', text or '').strip().lower()
+        return text.rstrip('%+ ').strip()
+    
     def _extract_number(self, text):
         """Extract numeric value from text"""
         if not text:
@@ -197,27 +441,91 @@ class StockDataFetcher:
                 return None
         return None
     
-    def get_stock_data(self, stock_name):
-        """Main method to get stock data"""
-        print(f"Searching for stock: {stock_name}")
+    def get_stock_data(self, stock_name, refresh=False, include_tables=False, incremental=False):
+        """Main method to get stock data; refresh=True bypasses the cache.
+        
+        include_tables=True also parses the historical tables into
+        stock_data['financials'] (a CompanyFinancials). incremental=True
+        revalidates cached pages with a conditional GET regardless of age and
+        sets stock_data['changed']; unchanged pages are not re-parsed.
+        """
+        if self.single_flight is None:
+            return self._get_stock_data(stock_name, refresh, include_tables, incremental)
+        
+        # Concurrent requests for the same stock share one search + fetch
+        key = (normalize_name(stock_name) or stock_name, refresh, include_tables, incremental)
+        result = self.single_flight.do(
+            key, self._get_stock_data, stock_name, refresh, include_tables, incremental
+        )
+        return dict(result, stock_name=stock_name) if result else None
+    
+    @metrics.timed('get_stock_data')
+    def _get_stock_data(self, stock_name, refresh, include_tables=False, incremental=False):
+        """Search, then read through the cache or fetch the company page"""
+        if self.verbose:
+            print(f"Searching for stock: {stock_name}")
         
         # Search for stock
         stock_url = self.search_stock(stock_name)
         if not stock_url:
             return None
             
-        print(f"Found stock URL: {stock_url}")
+        if self.verbose:
+            print(f"Found stock URL: {stock_url}")
+        
+        html = None
+        self.last_validators = (None, None)
+        if self.cache and not refresh:
+            cached = self.cache.get(stock_url, max_age=float('inf') if incremental else None)
+            fetch_source = 'cache'
+            metrics.count('page_cache_lookups', result='hit' if cached else 'miss')
+            if cached and incremental:
+                unchanged, html = self._revalidate(stock_url, cached)
+                fetch_source = 'unchanged' if unchanged else None
+                metrics.count('revalidations', result='unchanged' if unchanged else 'changed')
+            if cached and fetch_source:
+                stock_data = {
+                    'stock_name': stock_name,
+                    'url': stock_url,
+                    'financial_data': cached['financial_data'],
+                    'fetch_source': fetch_source
+                }
+                if incremental:
+                    stock_data['changed'] = False
+                if include_tables:
+                    from financial_tables import parse_financial_tables
+                    stock_data['financials'] = parse_financial_tables(cached['html'], stock_url)
+                return stock_data
         
         # Extract financial data
-        data = self.extract_financial_data(stock_url)
+        data = self.extract_financial_data(stock_url, html=html)
+        if self.cache and data and self.last_page_html:
+            # Validators and hash describe the static response, even when Chrome rendered the page
+            static_html = self.last_static_html
+            etag, last_modified = self.last_validators if static_html else (None, None)
+            self.cache.put(
+                stock_url, self.last_page_html, data, self.last_fetch_source, etag, last_modified,
+                content_hash=page_hash(static_html) if static_html else None
+            )
         
-        return {
+        stock_data = {
             'stock_name': stock_name,
             'url': stock_url,
-            'financial_data': data
+            'financial_data': data,
+            'fetch_source': self.last_fetch_source
         }
+        if incremental:
+            stock_data['changed'] = True
+        if include_tables:
+            from financial_tables import parse_financial_tables
+            stock_data['financials'] = parse_financial_tables(self.last_page_html or '', stock_url)
+        return stock_data
     
     def close(self):
-        """Close the driver"""
+        """Close the driver, or hand it back to the pool"""
         if self.driver:
-            self.driver.quit() 
\ No newline at end of file
+            if self.driver_pool:
+                self.driver_pool.release(self.driver, pages=self.pages_loaded)
+            else:
+                self.driver.quit()
+            self.driver = None 
\ No newline at end of file
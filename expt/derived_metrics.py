@@ -0,0 +1,75 @@
+"""
+Multi-year metrics computed over many companies' financial tables at once
+"""
+
+import numpy as np
+import pandas as pd
+
+def stack_rows(financials, section, label, years):
+    """(companies, years) array of a row's last `years` annual values, NaN-padded on the left"""
+    out = np.full((len(financials), years), np.nan)
+    for i, company in enumerate(financials):
+        row = company.row(section, label) if company is not None else None
+        if row is not None and len(row):
+            tail = row[-years:]
+            out[i, years - len(tail):] = tail
+    return out
+
+def cagr(values, years):
+    """Compound annual growth in % from values[:, -1 - years] to values[:, -1]; NaN when undefined"""
+    if values.shape[1] <= years:
+        return np.full(values.shape[0], np.nan)
+    start, end = values[:, -1 - years], values[:, -1]
+    valid = (start > 0) & (end > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (np.power(end / start, 1.0 / years) - 1) * 100
+    return np.where(valid, growth, np.nan)
+
+def mean_last(values, n):
+    """Mean of each company's last n values, ignoring blanks"""
+    tail = values[:, -n:]
+    counts = np.sum(~np.isnan(tail), axis=1)
+    sums = np.nansum(tail, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def trend_slope(values, n):
+    """Least-squares slope per year over the last n values; NaN if any are missing"""
+    tail = values[:, -n:]
+    x = np.arange(tail.shape[1], dtype=np.float64)
+    x -= x.mean()
+    y = tail - tail.mean(axis=1, keepdims=True)
+    return (y * x).sum(axis=1) / (x * x).sum()
+
+def positive_count(values, n):
+    """How many of the last n values are above zero"""
+    return np.sum(values[:, -n:] > 0, axis=1)
+
+def compute_derived_metrics(financials, index=None):
+    """DataFrame of growth, return and cash-flow metrics, one row per CompanyFinancials.
+    
+    Free cash flow is approximated as operating plus investing cash flow, since
+    capex isn't broken out in the public cash-flow table.
+    """
+    sales = stack_rows(financials, 'profit-loss', 'sales', 11)
+    profit = stack_rows(financials, 'profit-loss', 'net profit', 11)
+    eps = stack_rows(financials, 'profit-loss', 'eps in rs', 11)
+    roce = stack_rows(financials, 'ratios', 'roce', 10)
+    fcf = (stack_rows(financials, 'cash-flow', 'cash from operating activity', 10)
+           + stack_rows(financials, 'cash-flow', 'cash from investing activity', 10))
+    
+    return pd.DataFrame({
+        'sales_cagr_3y': cagr(sales, 3),
+        'sales_cagr_5y': cagr(sales, 5),
+        'sales_cagr_10y': cagr(sales, 10),
+        'profit_cagr_3y': cagr(profit, 3),
+        'profit_cagr_5y': cagr(profit, 5),
+        'profit_cagr_10y': cagr(profit, 10),
+        'eps_cagr_3y': cagr(eps, 3),
+        'eps_cagr_5y': cagr(eps, 5),
+        'avg_roce_3y': mean_last(roce, 3),
+        'avg_roce_5y': mean_last(roce, 5),
+        'fcf_latest': fcf[:, -1],
+        'fcf_positive_years_5y': positive_count(fcf, 5),
+        'fcf_slope_5y': trend_slope(fcf, 5),
+    }, index=index)
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # RSS-based recycling is skipped without psutil
+    psutil = None
+
+class DriverPool:
+    """Bounded pool of warm WebDriver instances with checkout/return semantics"""
+
+    def __init__(self, factory, max_size=2, max_pages=50, max_rss_mb=1024):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._idle = deque()
+        self._pages = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.created = 0
+        self.recycled = 0
+
+    def acquire(self, timeout=None):
+        """Check out a healthy driver, starting a new one if the pool has room"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            driver = None
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    driver = self._idle.popleft()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a free browser")
+                    self._cond.wait(remaining)
+                    continue
+
+            if driver is None:
+                return self._create()
+            if self._is_reusable(driver):
+                return driver
+            self._discard(driver)
+
+    def release(self, driver, pages=0):
+        """Return a driver to the pool, recycling it if it is worn out"""
+        with self._cond:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + pages
+            keep = not self._closed and not self._is_worn_out(driver)
+            if keep:
+                self._idle.append(driver)
+                self._cond.notify()
+        if not keep:
+            self._discard(driver)
+
+    @contextmanager
+    def borrow(self, timeout=None):
+        """Context manager around acquire/release"""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit every idle driver and refuse new checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for driver in idle:
+            self._discard(driver)
+
+    def stats(self):
+        """Current pool counters"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self.created,
+                'recycled': self.recycled,
+            }
+
+    def _create(self):
+        """Start a new driver for a slot already reserved in _size"""
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._pages[id(driver)] = 0
+            self.created += 1
+        return driver
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error quitting browser: {e}")
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            self._size -= 1
+            self.recycled += 1
+            self._cond.notify()
+
+    def _is_reusable(self, driver):
+        """Health check run before a driver is handed out"""
+        if self._is_worn_out(driver):
+            return False
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _is_worn_out(self, driver):
+        """True once a driver has served max_pages or grown past max_rss_mb"""
+        if self.max_pages and self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        rss_mb = self._rss_mb(driver)
+        return bool(self.max_rss_mb and rss_mb is not None and rss_mb > self.max_rss_mb)
+
+    def _rss_mb(self, driver):
+        """Resident memory of chromedriver and its browser processes, if measurable"""
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return None
@@ -0,0 +1,100 @@
+"""
+Historical financial tables from a company page as compact float64 arrays
+"""
+
+import re
+import numpy as np
+from bs4 import BeautifulSoup
+
+# Page sections holding period-indexed tables
+SECTIONS = ('quarters', 'profit-loss', 'balance-sheet', 'cash-flow', 'ratios', 'shareholding')
+
+def _clean_label(text):
+    """'Sales\xa0+' -> 'sales', 'ROCE %' -> 'roce %'"""
+    return re.sub(r'\s+', ' ', text or '').strip().rstrip('+').strip().lower()
+
+def _to_float(text):
+    text = (text or '').replace(',', '').replace('%', '').replace('₹', '').strip()
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+class FinancialTable:
+    """One section's table: row labels x periods, values as a float64 matrix (NaN = blank)"""
+
+    __slots__ = ('periods', 'labels', 'values')
+
+    def __init__(self, periods, labels, values):
+        self.periods = periods
+        self.labels = labels
+        self.values = values
+
+    def row(self, label, annual_only=False):
+        """Values of the first row whose label starts with `label` (case-insensitive), or None"""
+        wanted = _clean_label(label)
+        for i, name in enumerate(self.labels):
+            if name.startswith(wanted):
+                values = self.values[i]
+                if annual_only:
+                    values = values[self.annual_mask()]
+                return values
+        return None
+
+    def annual_mask(self):
+        """False for trailing-twelve-month and other non-period columns"""
+        return np.array([bool(re.match(r'[A-Za-z]{3} \d{4}$', p)) for p in self.periods], dtype=bool)
+
+class CompanyFinancials:
+    """All financial tables parsed from one company page"""
+
+    __slots__ = ('url', 'tables')
+
+    def __init__(self, url, tables):
+        self.url = url
+        self.tables = tables
+
+    def table(self, section):
+        return self.tables.get(section)
+
+    def row(self, section, label, annual_only=True):
+        """A table row by section and label prefix, or None if either is missing"""
+        table = self.tables.get(section)
+        return table.row(label, annual_only) if table else None
+
+    @property
+    def nbytes(self):
+        """Bytes held by the value arrays"""
+        return sum(t.values.nbytes for t in self.tables.values())
+
+def parse_financial_tables(html_or_soup, url=None):
+    """Parse every section in SECTIONS from company page HTML (or an already parsed soup)"""
+    soup = html_or_soup
+    if not isinstance(html_or_soup, BeautifulSoup):
+        soup = BeautifulSoup(html_or_soup, 'lxml')
+    
+    tables = {}
+    for section_id in SECTIONS:
+        section = soup.find(id=section_id)
+        table = section.find('table') if section else None
+        if table is None:
+            continue
+        
+        header = table.find('thead') or table
+        periods = [th.get_text(strip=True) for th in header.find('tr').find_all('th')[1:]]
+        labels, rows = [], []
+        for tr in (table.find('tbody') or table).find_all('tr'):
+            cells = tr.find_all('td')
+            if len(cells) < 2:
+                continue
+            values = [_to_float(td.get_text()) for td in cells[1:len(periods) + 1]]
+            values += [np.nan] * (len(periods) - len(values))
+            labels.append(_clean_label(cells[0].get_text()))
+            rows.append(values)
+        
+        if rows:
+            tables[section_id] = FinancialTable(
+                periods, labels, np.array(rows, dtype=np.float64).reshape(len(rows), len(periods))
+            )
+    
+    return CompanyFinancials(url, tables)
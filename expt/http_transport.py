@@ -0,0 +1,151 @@
+"""
+Shared HTTP transport: pooled connections, per-host concurrency, rate limiting and retries
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+from config import (
+    USER_AGENT, HTTP_POOL_SIZE, HTTP_MAX_PER_HOST, HTTP_REQUESTS_PER_MINUTE, HTTP_BURST,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_SECONDS, HTTP_BACKOFF_MAX_SECONDS,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+class TokenBucket:
+    """Thread-safe token bucket allowing rate_per_minute requests with bursts of up to `burst`"""
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class HTTPTransport(requests.Session):
+    """requests.Session that every fetcher in a process can share.
+    
+    Adds a sized connection pool, a cap on concurrent requests per host, a
+    global token-bucket rate limit, default (connect, read) timeouts and
+    retries with full-jitter backoff on 429/5xx and connection errors,
+    honouring Retry-After.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_per_host=HTTP_MAX_PER_HOST,
+                 requests_per_minute=HTTP_REQUESTS_PER_MINUTE, burst=HTTP_BURST,
+                 max_retries=HTTP_MAX_RETRIES, backoff=HTTP_BACKOFF_SECONDS,
+                 backoff_max=HTTP_BACKOFF_MAX_SECONDS,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        super().__init__()
+        self.headers.update({'User-Agent': USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.bucket = TokenBucket(requests_per_minute, burst=burst) if requests_per_minute > 0 else None
+        self.counters = {'requests': 0, 'retries': 0, 'failed': 0, 'throttled_seconds': 0.0}
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        """Send a request within the host and rate limits, retrying transient failures"""
+        kwargs.setdefault('timeout', self.timeout)
+        slots = self._slots_for(url)
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire() if self.bucket else 0.0
+            self._count('requests', 1)
+            self._count('throttled_seconds', waited)
+            try:
+                with slots:
+                    response = super().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.count('http_errors', error=type(e).__name__)
+                if attempt == self.max_retries:
+                    self._count('failed', 1)
+                    raise
+                delay = self._backoff_delay(attempt)
+            else:
+                metrics.count('http_responses', status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                response.close()
+            
+            # Back off outside the host slot so other requests can use it
+            self._count('retries', 1)
+            metrics.count('http_retries')
+            time.sleep(delay)
+
+    def stats(self):
+        """Request, retry and failure counters and seconds spent waiting on the rate limit"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _slots_for(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _count(self, name, amount):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _backoff_delay(self, attempt):
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def _retry_after(self, response):
+        """Seconds from a Retry-After header (delta or HTTP date), capped at backoff_max, or None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(self.backoff_max, max(0.0, delay))
+
+def get_transport():
+    """Process-wide HTTP transport, created on first use"""
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            _shared_transport = HTTPTransport()
+        return _shared_transport
@@ -0,0 +1,231 @@
+"""
+Async, rate-limit-aware scheduling of AI calls
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from ai_advisor import AIAdvisor
+from cache import ResponseCache
+from stub_model import StubModel
+import metrics
+from config import (
+    LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES, LLM_BACKOFF_SECONDS
+)
+
+# Provider exceptions (google.api_core names) for rate limits and transient server failures
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+    'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout'
+}
+
+def is_retryable(error):
+    """True for timeouts, 429s and 5xx-type provider errors; auth and bad requests aren't retried"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+class AsyncTokenBucket:
+    """Token bucket allowing rate_per_minute requests with bursts of up to `burst`"""
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncLLMScheduler:
+    """Runs blocking generate_content calls with a concurrency cap, RPM limit, timeout and retries"""
+
+    def __init__(self, model, max_concurrency=LLM_MAX_CONCURRENCY,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE, timeout=LLM_TIMEOUT_SECONDS,
+                 max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF_SECONDS, backoff_max=30.0):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.bucket = AsyncTokenBucket(requests_per_minute, burst=max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = {'requests': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'timeouts': 0}
+        self.latencies = []
+
+    async def generate(self, prompt):
+        """Response text for prompt, retrying timeouts, 429s and 5xx errors with exponential backoff.
+        
+        A timed-out call's worker thread can't be killed; it finishes in the
+        background, keeping its concurrency slot until then, and its result is
+        discarded.
+        """
+        self.stats['requests'] += 1
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await self._semaphore.acquire()
+                call = asyncio.get_running_loop().run_in_executor(None, self.model.generate_content, prompt)
+                # The slot is freed when the thread finishes, not when we stop waiting for it
+                call.add_done_callback(self._release)
+                response = await asyncio.wait_for(asyncio.shield(call), self.timeout)
+                self.stats['succeeded'] += 1
+                self.latencies.append(time.perf_counter() - start)
+                # Spans are per thread, so async calls report a plain histogram
+                metrics.observe('ai_request_seconds', self.latencies[-1], outcome='ok')
+                return response.text
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats['timeouts'] += 1
+                    metrics.count('ai_timeouts')
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.stats['failed'] += 1
+                    self.latencies.append(time.perf_counter() - start)
+                    metrics.observe('ai_request_seconds', self.latencies[-1], outcome='failed')
+                    raise
+                self.stats['retries'] += 1
+                metrics.count('ai_retries')
+                # Full jitter keeps retrying clients from hitting the provider in lockstep
+                delay = min(self.backoff_max, self.backoff * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+    def _release(self, call):
+        """Done callback of a model call: free its slot and consume any late error"""
+        self._semaphore.release()
+        if not call.cancelled():
+            call.exception()
+
+    def latency_report(self):
+        """Counters plus p50/p95/p99 latency in seconds"""
+        report = dict(self.stats)
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            for p in (50, 95, 99):
+                report[f'p{p}'] = round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4)
+        return report
+
+class AsyncAIAdvisor:
+    """Async front end to AIAdvisor whose model calls go through an AsyncLLMScheduler"""
+
+    def __init__(self, advisor=None, scheduler=None, single_flight=None):
+        self.advisor = advisor or AIAdvisor()
+        self.scheduler = scheduler or (AsyncLLMScheduler(self.advisor.model) if self.advisor.model else None)
+        self.single_flight = single_flight
+
+    async def _generate(self, prompt):
+        if self.single_flight is None:
+            return await self._generate_uncoalesced(prompt)
+        key = ResponseCache.make_key(self.advisor.model_name, prompt)
+        return await self.single_flight.do(key, self._generate_uncoalesced, prompt)
+
+    async def _generate_uncoalesced(self, prompt):
+        cache = self.advisor.response_cache
+        if cache:
+            cached = cache.get(self.advisor.model_name, prompt)
+            if cached is not None:
+                return cached
+        text = await self.scheduler.generate(prompt)
+        if cache:
+            cache.put(self.advisor.model_name, prompt, text)
+        return text
+
+    async def get_full_analysis(self, stock_name, financial_data, analysis_result):
+        """Async version of AIAdvisor.get_full_analysis (combined mode)"""
+        if not self.scheduler:
+            return await asyncio.to_thread(
+                self.advisor.get_full_analysis, stock_name, financial_data, analysis_result
+            )
+        try:
+            prompt = self.advisor._create_analysis_prompt(
+                stock_name, financial_data, analysis_result, include_quick_advice=True
+            )
+            result = self.advisor._parse_ai_response(await self._generate(prompt))
+            if not result['quick_advice']:
+                # The model skipped the section; ask for it on its own
+                result['quick_advice'] = await self.get_quick_advice(stock_name, analysis_result['verdict'])
+            return result
+        except Exception as e:
+            return {
+                'insights': f'Error getting AI insights: {str(e)}',
+                'recommendations': [],
+                'risk_factors': [],
+                'market_context': 'Error occurred while analyzing',
+                'quick_advice': f"Unable to get AI advice: {str(e)}"
+            }
+
+    async def get_quick_advice(self, stock_name, verdict):
+        """Async version of AIAdvisor.get_quick_advice"""
+        if not self.scheduler:
+            return await asyncio.to_thread(self.advisor.get_quick_advice, stock_name, verdict)
+        try:
+            prompt = self.advisor._create_quick_advice_prompt(stock_name, verdict)
+            return (await self._generate(prompt)).strip()
+        except Exception as e:
+            return f"Unable to get AI advice: {str(e)}"
+
+    async def analyze_many(self, stocks):
+        """Full analysis for (stock_name, financial_data, analysis_result) tuples, scheduled concurrently"""
+        results = await asyncio.gather(*(self.get_full_analysis(*stock) for stock in stocks))
+        return {stock[0]: result for stock, result in zip(stocks, results)}
+
+async def _measure(args):
+    model = StubModel(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    scheduler = AsyncLLMScheduler(
+        model,
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        timeout=args.timeout,
+        max_retries=args.retries,
+        backoff=args.backoff
+    )
+    advisor = AsyncAIAdvisor(AIAdvisor(model=model), scheduler)
+    analysis = {'verdict': 'HOLD', 'score': 4, 'total_criteria': 7, 'score_percentage': 57.1, 'reason': 'stub'}
+    stocks = [(f"STUB{i}", {'roe': 18.0, 'pe_ratio': 22.0}, analysis) for i in range(args.requests)]
+    
+    start = time.perf_counter()
+    await advisor.analyze_many(stocks)
+    elapsed = time.perf_counter() - start
+    
+    report = scheduler.latency_report()
+    report.update({
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(args.requests / elapsed, 3),
+        'model_calls': model.calls,
+    })
+    return report
+
+def main():
+    """Measure scheduler throughput and tail latency against the stub model"""
+    parser = argparse.ArgumentParser(description="Offline AI scheduler benchmark")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument('--rpm', type=float, default=600)
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--retries', type=int, default=LLM_MAX_RETRIES)
+    parser.add_argument('--backoff', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_measure(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,13 @@ Stock Analysis Tool
 Analyzes Indian stocks based on investment criteria and provides AI-powered insights
 """
 
+import argparse
 import sys
 import time
-from data_fetcher import StockDataFetcher
-from stock_analyzer import StockAnalyzer
-from ai_advisor import AIAdvisor
+
+# Scraping (selenium, bs4), AI (google.generativeai) and pandas are imported
+# inside the functions that need them, so --help, --offline and --no-ai runs
+# don't pay for stacks they never use.
 
 def print_banner():
     """Print application banner"""
@@ -38,19 +40,64 @@ def print_verdict(verdict, color_code):
     color = colors.get(verdict, '')
     print(f"{color}🎯 VERDICT: {verdict}{reset}")
 
-def analyze_stock(stock_name):
+def print_analysis(stock_name, analyzer, analysis_result):
+    """Print verdict, score and per-criterion details"""
+    print("\n" + "=" * 50)
+    print(f"📋 ANALYSIS RESULTS FOR {stock_name.upper()}")
+    print("=" * 50)
+    
+    # Print verdict
+    print_verdict(analysis_result['verdict'], analysis_result['verdict'])
+    print(f"📊 Score: {analysis_result['score']}/{analysis_result['total_criteria']} ({analysis_result['score_percentage']:.1f}%)")
+    print(f"💡 Reason: {analysis_result['reason']}")
+    
+    # Print detailed analysis
+    print("\n📊 DETAILED ANALYSIS:")
+    details = analyzer.get_detailed_analysis(analysis_result)
+    for detail in details:
+        print(f"  {detail}")
+
+def print_ai_insights(ai_insights):
+    """Print AI insights, recommendations, risks, context and quick advice"""
+    print(f"💭 Insights: {ai_insights['insights']}")
+    
+    if ai_insights['recommendations']:
+        print("\n📝 Recommendations:")
+        for i, rec in enumerate(ai_insights['recommendations'], 1):
+            print(f"  {i}. {rec}")
+    
+    if ai_insights['risk_factors']:
+        print("\n⚠️ Risk Factors:")
+        for i, risk in enumerate(ai_insights['risk_factors'], 1):
+            print(f"  {i}. {risk}")
+    
+    if ai_insights['market_context']:
+        print(f"\n🌍 Market Context: {ai_insights['market_context']}")
+    
+    # Quick AI advice
+    print(f"\n💡 Quick Advice: {ai_insights['quick_advice']}")
+
+def analyze_stock(stock_name, refresh=False, with_ai=True):
     """Main function to analyze a stock"""
+    from data_fetcher import StockDataFetcher, get_driver_pool
+    from stock_analyzer import StockAnalyzer
+    from cache import get_shared_cache
+    from company_index import get_company_index
+    
     print(f"\n🔍 Analyzing {stock_name.upper()}...")
     print("Fetching data from screener.in...")
     
     # Initialize components
-    fetcher = StockDataFetcher()
+    fetcher = StockDataFetcher(
+        driver_pool=get_driver_pool(),
+        cache=get_shared_cache(),
+        company_index=get_company_index()
+    )
     analyzer = StockAnalyzer()
-    ai_advisor = AIAdvisor()
     
     try:
         # Fetch stock data
-        stock_data = fetcher.get_stock_data(stock_name)
+        stock_data = fetcher.get_stock_data(stock_name, refresh=refresh)
         
         if not stock_data:
             print("❌ Could not find stock data. Please check the stock name.")
@@ -58,53 +105,32 @@ def analyze_stock(stock_name):
         
         print("✅ Data fetched successfully!")
         print(f"📊 Stock URL: {stock_data['url']}")
+        print(f"⚙️ Fetched via: {stock_data['fetch_source']}")
         
         # Analyze stock
         print("\n📈 Analyzing financial metrics...")
         analysis_result = analyzer.analyze_stock(stock_data['financial_data'])
         
         # Display results
-        print("\n" + "=" * 50)
-        print(f"📋 ANALYSIS RESULTS FOR {stock_name.upper()}")
-        print("=" * 50)
-        
-        # Print verdict
-        print_verdict(analysis_result['verdict'], analysis_result['verdict'])
-        print(f"📊 Score: {analysis_result['score']}/{analysis_result['total_criteria']} ({analysis_result['score_percentage']:.1f}%)")
-        print(f"💡 Reason: {analysis_result['reason']}")
+        print_analysis(stock_name, analyzer, analysis_result)
         
-        # Print detailed analysis
-        print("\n📊 DETAILED ANALYSIS:")
-        details = analyzer.get_detailed_analysis(analysis_result)
-        for detail in details:
-            print(f"  {detail}")
+        if not with_ai:
+            print("\n" + "=" * 50)
+            return
         
         # Get AI insights
+        from ai_advisor import AIAdvisor
+        from cache import get_response_cache
+        
         print("\n🤖 AI INSIGHTS:")
-        ai_insights = ai_advisor.get_ai_insights(
+        ai_advisor = AIAdvisor(response_cache=get_response_cache())
+        ai_insights = ai_advisor.get_full_analysis(
             stock_name, 
             stock_data['financial_data'], 
             analysis_result
         )
         
-        print(f"💭 Insights: {ai_insights['insights']}")
-        
-        if ai_insights['recommendations']:
-            print("\n📝 Recommendations:")
-            for i, rec in enumerate(ai_insights['recommendations'], 1):
-                print(f"  {i}. {rec}")
-        
-        if ai_insights['risk_factors']:
-            print("\n⚠️ Risk Factors:")
-            for i, risk in enumerate(ai_insights['risk_factors'], 1):
-                print(f"  {i}. {risk}")
-        
-        if ai_insights['market_context']:
-            print(f"\n🌍 Market Context: {ai_insights['market_context']}")
-        
-        # Quick AI advice
-        quick_advice = ai_advisor.get_quick_advice(stock_name, analysis_result['verdict'])
-        print(f"\n💡 Quick Advice: {quick_advice}")
+        print_ai_insights(ai_insights)
         
         print("\n" + "=" * 50)
         
@@ -115,41 +141,221 @@ def analyze_stock(stock_name):
         # Clean up
         fetcher.close()
 
-def main():
-    """Main application entry point"""
-    print_banner()
+def analyze_cached(stock_names):
+    """Score stocks from the page cache only: no network, browser or AI"""
+    from cache import get_shared_cache
+    from company_index import get_company_index, company_path, normalize_name
+    from stock_analyzer import StockAnalyzer
     
-    if len(sys.argv) > 1:
-        # Stock name provided as command line argument
-        stock_name = sys.argv[1]
-        analyze_stock(stock_name)
-    else:
-        # Interactive mode
+    cache = get_shared_cache()
+    company_index = get_company_index()
+    analyzer = StockAnalyzer()
+    single = len(stock_names) == 1
+    
+    for stock_name in stock_names:
+        # Look up by symbol: the cached URL may be the consolidated or standalone
+        # page, and a name typed as a symbol may never have been indexed
+        stock_url = company_index.lookup(stock_name)
+        path = company_path(stock_url) if stock_url else None
+        symbols = [path.split('/')[2]] if path else []
+        symbols.append(normalize_name(stock_name))
+        cached = None
+        for symbol in symbols:
+            cached = cache.find(symbol, max_age=float('inf'))
+            if cached:
+                break
+        if not cached:
+            print(f"{stock_name:<15} ❌ not in cache (run without --offline first)")
+            continue
+        stock_url = cached['url']
+        
+        analysis_result = analyzer.analyze_stock(cached['financial_data'])
+        age_hours = (time.time() - cached['fetched_at']) / 3600
+        if single:
+            print(f"\n📦 Cached data from {age_hours:.1f}h ago: {stock_url}")
+            print_analysis(stock_name, analyzer, analysis_result)
+        else:
+            print(f"{stock_name:<15} {analysis_result['verdict']:<5} "
+                  f"{analysis_result['score']}/{analysis_result['total_criteria']} "
+                  f"({analysis_result['score_percentage']:.1f}%)  [cached {age_hours:.1f}h ago]")
+
+def run_batch_mode(tickers, workers, browsers, refresh=False, with_ai=False, incremental=False,
+                   peers=False):
+    """Analyze many tickers concurrently, streaming a line per ticker"""
+    from batch_runner import (
+        run_batch, run_peer_sweep, add_ai_analysis, changed_results, save_snapshot,
+        format_result, format_ai_result, print_batch_summary
+    )
+    from cache import get_shared_cache, get_response_cache
+    from company_index import get_company_index
+    
+    print(f"\n🚀 Batch mode: {len(tickers)} tickers{' and their peers' if peers else ''}, "
+          f"{workers} workers, {browsers} browsers\n")
+    results, elapsed = (run_peer_sweep if peers else run_batch)(
+        tickers,
+        workers=workers,
+        browser_workers=browsers,
+        cache=get_shared_cache(),
+        company_index=get_company_index(),
+        refresh=refresh,
+        on_result=lambda result: print(format_result(result), flush=True),
+        incremental=incremental
+    )
+    
+    # Unchanged pages already had their advice on an earlier run
+    ai_results = changed_results(results)
+    if with_ai and ai_results:
+        from ai_advisor import AIAdvisor
+        
+        print("\n🤖 AI QUICK ADVICE:")
+        add_ai_analysis(
+            ai_results,
+            AIAdvisor(response_cache=get_response_cache()),
+            on_result=lambda result: print(format_ai_result(result), flush=True)
+        )
+    
+    print_batch_summary(results, elapsed)
+    
+    snapshot_path = save_snapshot(results)
+    if snapshot_path:
+        print(f"💾 Snapshot written to {snapshot_path}")
+
+SESSION_HELP = """Commands:
+  <stock name>          analyze one stock
+  compare A B C         side-by-side comparison (names separated by spaces or commas)
+  queue A B C           queue stocks; the next few load in the background
+  next                  analyze the next queued stock
+  help                  show this help
+  quit                  exit"""
+
+def show_session_stock(session, stock_name):
+    """Analyze one stock through the session and print it"""
+    print(f"\n🔍 Analyzing {stock_name.upper()}...")
+    entry = session.analyze(stock_name)
+    if not entry:
+        print("❌ Could not find stock data. Please check the stock name.")
+        return
+    
+    stock_data = entry['stock_data']
+    ready = "prefetched" if entry.get('prefetched') else f"{entry['seconds']:.1f}s"
+    print(f"📊 Stock URL: {stock_data['url']}")
+    print(f"⚙️ Fetched via: {stock_data['fetch_source']} ({ready})")
+    print_analysis(stock_name, session.analyzer, entry['analysis'])
+    
+    if session.with_ai:
+        print("\n🤖 AI INSIGHTS:")
+        print_ai_insights(session.ai_insights(stock_name, entry))
+    print("\n" + "=" * 50)
+
+def run_interactive(args):
+    """REPL over one AnalysisSession, so later stocks reuse the warm fetcher, browser and advisor"""
+    if args.offline:
+        from session import split_names
+        while True:
+            try:
+                line = input("\n📝 Enter stock name(s) (or 'quit' to exit): ").strip()
+            except (KeyboardInterrupt, EOFError):
+                break
+            if line.lower() in ['quit', 'exit', 'q']:
+                break
+            if line:
+                analyze_cached(split_names(line))
+        print("\n👋 Goodbye!")
+        return
+    
+    from session import AnalysisSession, format_comparison, split_names
+    
+    session = AnalysisSession(refresh=args.refresh, with_ai=not args.no_ai)
+    session.prefetch_recent()
+    print("\n" + SESSION_HELP)
+    try:
         while True:
             try:
-                stock_name = input("\n📝 Enter stock name (or 'quit' to exit): ").strip()
+                line = input("\n📝 Enter stock name or command: ").strip()
+                command, _, rest = line.partition(' ')
+                command = command.lower()
                 
-                if stock_name.lower() in ['quit', 'exit', 'q']:
-                    print("👋 Goodbye!")
+                if command in ['quit', 'exit', 'q']:
                     break
-                
-                if not stock_name:
+                elif not line:
                     print("❌ Please enter a valid stock name.")
-                    continue
-                
-                analyze_stock(stock_name)
-                
-                # Ask if user wants to analyze another stock
-                another = input("\n🔄 Analyze another stock? (y/n): ").strip().lower()
-                if another not in ['y', 'yes']:
-                    print("👋 Goodbye!")
-                    break
+                elif command == 'help':
+                    print(SESSION_HELP)
+                elif command == 'compare':
+                    names = split_names(rest)
+                    if len(names) < 2:
+                        print("❌ Usage: compare A B [C ...]")
+                        continue
+                    print(f"\n🔍 Comparing {', '.join(n.upper() for n in names)}...\n")
+                    print(format_comparison(session.compare(names)))
+                elif command == 'queue':
+                    session.set_queue(split_names(rest))
+                    print(f"📋 Queued {len(session.queue)} stocks; type 'next' to analyze them")
+                elif command == 'next':
+                    stock_name = session.next_in_queue()
+                    if stock_name:
+                        show_session_stock(session, stock_name)
+                    else:
+                        print("📋 Queue is empty")
+                else:
+                    show_session_stock(session, line)
                     
             except KeyboardInterrupt:
-                print("\n\n👋 Goodbye!")
+                print()
+                break
+            except EOFError:
                 break
             except Exception as e:
                 print(f"❌ Unexpected error: {str(e)}")
+    finally:
+        print("\n👋 Goodbye!")
+        session.close()
+
+def stock_names(words):
+    """Names from the positional arguments: the words form one name unless commas separate several"""
+    return [name.strip() for name in ' '.join(words).split(',') if name.strip()]
+
+def parse_args(argv):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Analyze Indian stocks from screener.in")
+    parser.add_argument('stocks', nargs='*', help="Stock name, e.g. Tata Motors; several comma-separated names run batch mode")
+    parser.add_argument('--batch', metavar='FILE', help="File of tickers to analyze in batch mode")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent tickers in batch mode")
+    parser.add_argument('--browsers', type=int, default=2, help="Max Chrome instances in batch mode")
+    parser.add_argument('--ai', action='store_true', help="Add AI quick advice in batch mode (several stocks per call)")
+    parser.add_argument('--refresh', action='store_true', help="Bypass the page cache and fetch fresh data")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Batch mode: revalidate cached pages; skip re-parsing and AI for unchanged ones")
+    parser.add_argument('--peers', action='store_true',
+                        help="Batch mode: also score every peer from the peer tables, loading "
+                             "full pages only for peers the table can't decide")
+    parser.add_argument('--no-ai', action='store_true', help="Skip AI insights (the AI library is never loaded)")
+    parser.add_argument('--offline', action='store_true',
+                        help="Score cached data only, without network, browser or AI")
+    return parser.parse_args(argv)
+
+def main():
+    """Main application entry point"""
+    args = parse_args(sys.argv[1:])
+    print_banner()
+    
+    names = stock_names(args.stocks)
+    tickers = list(names)
+    if args.batch:
+        from batch_runner import load_tickers
+        tickers += load_tickers(args.batch)
+    
+    if args.offline and tickers:
+        analyze_cached(tickers)
+    elif args.batch or len(names) > 1 or (args.peers and tickers):
+        run_batch_mode(tickers, args.workers, args.browsers, refresh=args.refresh,
+                       with_ai=args.ai and not args.no_ai, incremental=args.incremental,
+                       peers=args.peers)
+    elif names:
+        # Stock name provided as command line argument
+        analyze_stock(names[0], refresh=args.refresh, with_ai=not args.no_ai)
+    else:
+        run_interactive(args)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
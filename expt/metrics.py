@@ -0,0 +1,200 @@
+"""
+Lightweight in-process metrics: nested span timings, counters and histograms
+
+Export as JSON lines (one per finished span, see METRICS_JSONL_PATH) or as
+Prometheus text (to_prometheus, served by api_server at /metrics).
+"""
+
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from config import METRICS_ENABLED, METRICS_JSONL_PATH
+
+PREFIX = 'screener_'
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Counters and histograms keyed by (name, sorted label items), plus the span stack"""
+
+    def __init__(self, enabled=METRICS_ENABLED, jsonl_path=METRICS_JSONL_PATH):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._jsonl = open(jsonl_path, 'a', encoding='utf-8') if enabled and jsonl_path else None
+
+    def count(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a value (seconds, normally) in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block; spans opened inside it on the same thread are its children.
+        
+        The duration goes to the span_seconds histogram labelled with the
+        span's path (e.g. 'get_stock_data/search'); attrs only go to JSONL.
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        path = f"{stack[-1]}/{name}" if stack else name
+        stack.append(path)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self.observe('span_seconds', duration, span=path)
+            if error:
+                self.count('span_errors', span=path, error=error)
+            if self._jsonl is not None:
+                self._write_span(path, duration, error, attrs)
+
+    def _write_span(self, path, duration, error, attrs):
+        record = {
+            'ts': round(time.time(), 6),
+            'span': path,
+            'seconds': round(duration, 6),
+            'thread': threading.current_thread().name,
+        }
+        if error:
+            record['error'] = error
+        if attrs:
+            record['attrs'] = attrs
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            self._jsonl.write(line)
+            self._jsonl.flush()
+
+    def snapshot(self):
+        """JSON-friendly copy of every counter and histogram"""
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'count': h.count, 'sum': round(h.sum, 6),
+                 'buckets': dict(zip([str(b) for b in h.bounds] + ['+Inf'], h.counts))}
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (h.bounds, list(h.counts), h.sum, h.count)) for key, h in self.histograms.items()
+            )
+        
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        
+        for (name, labels), (bounds, counts, total, count) in histograms:
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(list(bounds) + ['+Inf'], counts):
+                cumulative += bucket
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop every counter and histogram"""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+def _format_labels(labels):
+    """{k="v",...} with Prometheus escaping, or '' for no labels"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Process-wide registry used by the module-level helpers
+registry = MetricsRegistry()
+
+def span(name, **attrs):
+    return registry.span(name, **attrs)
+
+def timed(name):
+    """Decorator running the function inside span(name)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with registry.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, amount=1, **labels):
+    registry.count(name, amount, **labels)
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+def snapshot():
+    return registry.snapshot()
+
+def to_prometheus():
+    return registry.to_prometheus()
@@ -0,0 +1,89 @@
+"""
+Peer comparison table: partial financial data for a dozen companies per page load
+"""
+
+import re
+from bs4 import BeautifulSoup
+from config import SCREENER_BASE_URL
+from company_index import company_path
+from stock_analyzer import FRAME_METRICS
+
+# Peer table column headers for each metric, with units (Rs., %) dropped.
+# Which columns appear depends on the column settings of the screener.in account
+PEER_COLUMN_LABELS = {
+    'pe_ratio': ['P/E'],
+    'roe': ['ROE'],
+    'roce': ['ROCE'],
+    'debt_to_equity': ['Debt / Eq', 'Debt to equity'],
+    'peg': ['PEG', 'PEG Ratio'],
+    'eps': ['EPS 12M', 'EPS'],
+    'book_value': ['Book Value'],
+}
+
+# Unit suffixes of peer column headers: "CMP Rs.", "Mar Cap Rs.Cr.", "ROE %"
+UNIT_SUFFIX_RE = re.compile(r'(?:\s+(?:rs\.?\s*cr\.?|rs\.?|cr\.?)|\s*%)+$')
+
+def _header_label(th):
+    """Header text, including text inside tooltip or link markup, without its unit; normalized for matching"""
+    text = re.sub(r'\s+', ' ', th.get_text(' ', strip=True)).lower()
+    return UNIT_SUFFIX_RE.sub('', text).strip()
+
+def _number(text):
+    """Float from a table cell, or None if it is blank"""
+    match = re.search(r'-?[\d.]+', (text or '').replace(',', ''))
+    try:
+        return float(match.group()) if match else None
+    except ValueError:
+        return None
+
+def peer_ticker(url):
+    """Screener symbol of a company URL (the path segment after /company/)"""
+    path = company_path(url)
+    return path.split('/')[2] if path else None
+
+def peer_fragment_url(soup):
+    """URL of the peers fragment the page loads with JavaScript, or None"""
+    holder = soup.select_one('[data-warehouse-id]')
+    if holder is None or not holder['data-warehouse-id'].strip():
+        return None
+    return f"{SCREENER_BASE_URL}/api/company/{holder['data-warehouse-id'].strip()}/peers/"
+
+def parse_peer_table(html_or_soup, base_url=SCREENER_BASE_URL):
+    """Rows of the peer comparison table as [{'name', 'url', 'financial_data'}].
+
+    Accepts a company page or the bare peers fragment. financial_data has every
+    analyzer metric, None where the table has no column for it; the median
+    footer row is skipped.
+    """
+    soup = html_or_soup
+    if not isinstance(soup, BeautifulSoup):
+        soup = BeautifulSoup(html_or_soup or '', 'lxml')
+    table = soup.select_one('#peers table') or (None if soup.select_one('#peers') else soup.select_one('table'))
+    if table is None:
+        return []
+
+    header = next((tr for tr in table.find_all('tr') if tr.find('th')), None)
+    if header is None:
+        return []
+    labels = [_header_label(th) for th in header.find_all('th')]
+    columns = {}
+    for metric, names in PEER_COLUMN_LABELS.items():
+        for name in names:
+            if name.lower() in labels:
+                columns[metric] = labels.index(name.lower())
+                break
+
+    peers = []
+    for row in table.find_all('tr'):
+        link = row.find('a', href=re.compile(r'/company/'))
+        if link is None or row.find_parent('tfoot') is not None:
+            continue
+        cells = row.find_all('td')
+        values = {m: _number(cells[i].get_text()) if i < len(cells) else None for m, i in columns.items()}
+        href = link['href']
+        peers.append({
+            'name': link.get_text(strip=True),
+            'url': href if href.startswith('http') else base_url + href,
+            'financial_data': {m: values.get(m) for m in FRAME_METRICS},
+        })
+    return peers
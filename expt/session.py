@@ -0,0 +1,246 @@
+"""
+Interactive analysis session: one long-lived fetcher and AI advisor, with background prefetch
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from company_index import normalize_name
+from config import SESSION_PREFETCH, SESSION_HISTORY_PATH, SESSION_HISTORY_MAX
+
+# The scraping stack (bs4, lxml, requests) and numpy are imported by
+# AnalysisSession, so the offline REPL can use split_names without them.
+
+def split_names(text):
+    """'TCS, HDFC Bank' -> ['TCS', 'HDFC Bank']; without commas, split on whitespace"""
+    parts = text.split(',') if ',' in text else text.split()
+    return [p.strip() for p in parts if p.strip()]
+
+class AnalysisSession:
+    """Owns the fetcher, analyzer and advisor for a whole REPL session.
+    
+    Results are kept per ticker for the life of the session. Tickers likely to
+    be asked for next (recent history, the rest of a queue, every name in a
+    comparison) are fetched on background threads so they are ready on request.
+    """
+
+    def __init__(self, refresh=False, with_ai=True, prefetch_workers=2,
+                 history_path=SESSION_HISTORY_PATH, prefetch_count=SESSION_PREFETCH,
+                 history_max=SESSION_HISTORY_MAX):
+        from cache import get_shared_cache, get_response_cache
+        from company_index import get_company_index
+        from data_fetcher import get_driver_pool
+        from singleflight import get_group
+        from stock_analyzer import StockAnalyzer
+        
+        self.refresh = refresh
+        self.with_ai = with_ai
+        self.history_path = history_path
+        self.prefetch_count = prefetch_count
+        self.history_max = history_max
+        self.driver_pool = get_driver_pool()
+        self.cache = get_shared_cache()
+        self.company_index = get_company_index()
+        self.analyzer = StockAnalyzer()
+        self.advisor = None
+        if with_ai:
+            from ai_advisor import AIAdvisor
+            self.advisor = AIAdvisor(response_cache=get_response_cache(), single_flight=get_group('ai'))
+        
+        # The foreground fetcher keeps its browser (if it ever needs one) between stocks
+        self.fetcher = self._new_fetcher()
+        self.queue = []
+        self._entries = {}
+        self._ai_pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix='prefetch')
+
+    def _new_fetcher(self):
+        from data_fetcher import StockDataFetcher
+        from http_transport import get_transport
+        from singleflight import get_group
+        
+        return StockDataFetcher(
+            driver_pool=self.driver_pool, cache=self.cache, company_index=self.company_index,
+            session=get_transport(), single_flight=get_group('fetch'), verbose=False
+        )
+
+    def _key(self, stock_name):
+        return normalize_name(stock_name) or stock_name.strip().upper()
+
+    def _load(self, stock_name, fetcher):
+        """Fetch and score one stock: {'stock_data', 'analysis', 'seconds'} or None if not found"""
+        start = time.perf_counter()
+        stock_data = fetcher.get_stock_data(stock_name, refresh=self.refresh)
+        if not stock_data:
+            return None
+        return {
+            'stock_data': stock_data,
+            'analysis': self.analyzer.analyze_stock(stock_data['financial_data']),
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _prefetch_one(self, stock_name, with_ai):
+        # Background fetchers hand their browser back to the pool after each stock
+        fetcher = self._new_fetcher()
+        try:
+            entry = self._load(stock_name, fetcher)
+        finally:
+            fetcher.close()
+        if entry and with_ai and self.advisor:
+            entry['ai'] = self._get_ai(stock_name, entry)
+        return entry
+
+    def _prefetch_ai(self, stock_name, key, loading):
+        # loading was submitted before this job, so it has already started or finished
+        try:
+            entry = loading.result() if isinstance(loading, Future) else loading
+            if entry and 'ai' not in entry:
+                entry['ai'] = self._get_ai(stock_name, entry)
+        finally:
+            with self._lock:
+                self._ai_pending.discard(key)
+    
+    def prefetch(self, stock_names, with_ai=False):
+        """Start loading stocks in the background.
+        
+        Stocks already known are not fetched again; with_ai=True still adds AI
+        insights to ones first loaded without them.
+        """
+        with self._lock:
+            for stock_name in stock_names:
+                key = self._key(stock_name)
+                loading = self._entries.get(key)
+                if loading is None:
+                    self._entries[key] = self._executor.submit(self._prefetch_one, stock_name, with_ai)
+                elif with_ai and self.advisor and key not in self._ai_pending:
+                    if isinstance(loading, dict) and 'ai' in loading:
+                        continue
+                    self._ai_pending.add(key)
+                    self._executor.submit(self._prefetch_ai, stock_name, key, loading)
+
+    def analyze(self, stock_name):
+        """Fetched data and analysis for a stock, from the session if it is already loaded"""
+        key = self._key(stock_name)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not isinstance(entry, dict):
+            try:
+                entry = entry.result()
+                if entry is not None:
+                    entry['prefetched'] = True
+            except Exception as e:
+                print(f"Background fetch of {stock_name} failed ({e}), retrying")
+                entry = self._load(stock_name, self.fetcher)
+        elif entry is None:
+            entry = self._load(stock_name, self.fetcher)
+        
+        with self._lock:
+            if entry is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = entry
+        if entry is not None:
+            self._record_history(stock_name)
+        return entry
+
+    def ai_insights(self, stock_name, entry):
+        """AI insights for a loaded stock, computed once per session"""
+        if 'ai' not in entry:
+            entry['ai'] = self._get_ai(stock_name, entry)
+        return entry['ai']
+
+    def _get_ai(self, stock_name, entry):
+        return self.advisor.get_full_analysis(
+            stock_name, entry['stock_data']['financial_data'], entry['analysis']
+        )
+
+    def compare(self, stock_names):
+        """(name, entry) for each stock, loaded concurrently; entry is None if not found"""
+        self.prefetch(stock_names)
+        return [(name, self.analyze(name)) for name in stock_names]
+
+    def set_queue(self, stock_names):
+        """Queue stocks for 'next' and start fetching the first few"""
+        self.queue = list(stock_names)
+        self.prefetch(self.queue[:self.prefetch_count], with_ai=self.with_ai)
+
+    def next_in_queue(self):
+        """Pop the next queued stock, prefetching the ones after it; None when empty"""
+        if not self.queue:
+            return None
+        stock_name = self.queue.pop(0)
+        self.prefetch(self.queue[:self.prefetch_count], with_ai=self.with_ai)
+        return stock_name
+
+    def prefetch_recent(self):
+        """Warm the session with the most recently analyzed stocks from earlier sessions"""
+        self.prefetch(self.recent_history(self.prefetch_count))
+
+    def recent_history(self, limit):
+        """Most recent distinct stock names from the history file, newest first"""
+        try:
+            with open(self.history_path, encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except OSError:
+            return []
+        seen, recent = set(), []
+        for name in reversed(lines):
+            key = self._key(name)
+            if key not in seen:
+                seen.add(key)
+                recent.append(name)
+            if len(recent) == limit:
+                break
+        return recent
+
+    def _record_history(self, stock_name):
+        """Move stock_name to the end of the history file, keeping the last history_max names"""
+        key = self._key(stock_name)
+        try:
+            with open(self.history_path, encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except OSError:
+            lines = []
+        lines = [name for name in lines if self._key(name) != key] + [stock_name.strip()]
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            with open(self.history_path, 'w', encoding='utf-8') as f:
+                f.write(''.join(name + '\n' for name in lines[-self.history_max:]))
+        except OSError:
+            pass
+
+    def close(self):
+        """Stop prefetching and release the browser.
+        
+        Queued prefetches are cancelled; one already loading a page finishes in
+        the background instead of holding up the exit.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.fetcher.close()
+
+def format_comparison(results):
+    """Side-by-side table of verdicts, scores and metrics for compare()"""
+    from stock_analyzer import FRAME_METRICS
+    
+    found = [(name, entry) for name, entry in results if entry]
+    lines = []
+    if found:
+        width = max(12, *(len(name) + 2 for name, _ in found))
+        header = f"{'':<16}" + ''.join(f"{name.upper():>{width}}" for name, _ in found)
+        lines.append(header)
+        lines.append('-' * len(header))
+        lines.append(f"{'Verdict':<16}" + ''.join(f"{e['analysis']['verdict']:>{width}}" for _, e in found))
+        lines.append(f"{'Score':<16}" + ''.join(
+            f"{e['analysis']['score']}/{e['analysis']['total_criteria']}".rjust(width) for _, e in found
+        ))
+        lines.append(f"{'Score %':<16}" + ''.join(f"{e['analysis']['score_percentage']:>{width}.1f}" for _, e in found))
+        for metric in FRAME_METRICS:
+            values = [e['stock_data']['financial_data'].get(metric) for _, e in found]
+            cells = ''.join(('N/A' if v is None else f"{v:,.2f}").rjust(width) for v in values)
+            lines.append(f"{metric.upper().replace('_', ' '):<16}" + cells)
+    for name, entry in results:
+        if not entry:
+            lines.append(f"❌ {name}: not found")
+    return '\n'.join(lines)
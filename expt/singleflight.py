@@ -0,0 +1,107 @@
+"""
+Single-flight: concurrent calls for the same key share one in-flight execution
+"""
+
+import asyncio
+import threading
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Thread-based single-flight group with counters"""
+
+    def __init__(self, name=''):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs), or wait for and share the result of a running call with the same key"""
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def stats(self):
+        """Call, execution and coalesced counters"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._inflight),
+            }
+
+class AsyncSingleFlight(SingleFlight):
+    """Single-flight group for coroutines running on one event loop"""
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs), or share the result of an in-flight call with the same key"""
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = self._inflight[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                future.add_done_callback(lambda _: self._forget(key))
+                self.executions += 1
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+def get_group(name, async_group=False):
+    """Process-wide named single-flight group.
+    
+    A name belongs to one kind of group: asking for the other kind raises
+    TypeError rather than returning a group whose do() can't be used.
+    """
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = AsyncSingleFlight(name) if async_group else SingleFlight(name)
+        group = _groups[name]
+    if isinstance(group, AsyncSingleFlight) != bool(async_group):
+        kind = 'async' if isinstance(group, AsyncSingleFlight) else 'thread-based'
+        raise TypeError(f"single-flight group {name!r} is {kind}")
+    return group
+
+def all_stats():
+    """Counters for every named group"""
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.stats() for name, group in groups.items()}
@@ -0,0 +1,149 @@
+"""
+Columnar snapshots of an analysed universe: one memory-mapped .npy file per metric
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from cache import PARTIAL_SOURCE
+from company_index import company_path
+from config import SNAPSHOT_DIR, SNAPSHOT_KEEP
+from stock_analyzer import FRAME_METRICS, VERDICTS
+
+# Analysis columns stored next to the raw metrics
+ANALYSIS_COLUMNS = ['score', 'total_criteria', 'score_percentage', 'intrinsic_value']
+
+LATEST_FILE = 'LATEST'
+
+def results_to_frame(results):
+    """Metrics DataFrame from analyzed batch results, indexed by screener symbol.
+    
+    Rows are keyed by the symbol in the company URL (the typed ticker if there
+    is none), as the cache universe is. Partial peer-table records are left
+    out, so snapshots only hold full pages.
+    """
+    records = {}
+    for r in results:
+        if r['status'] == 'ok' and r.get('fetch_source') != PARTIAL_SOURCE:
+            path = company_path(r.get('url') or '')
+            records[path.split('/')[2] if path else r['ticker']] = r['financial_data']
+    frame = pd.DataFrame.from_dict(records, orient='index', columns=FRAME_METRICS)
+    return frame.astype(float)
+
+def merge_with_latest(frame, directory=SNAPSHOT_DIR):
+    """frame plus the latest snapshot's rows for tickers frame doesn't have.
+    
+    A batch only covers the tickers it was given, so each snapshot carries the
+    earlier ones forward; frame's rows win (tickers match case-insensitively).
+    """
+    snapshot = open_snapshot(directory)
+    if snapshot is None or not len(snapshot):
+        return frame
+    previous = snapshot.to_frame([m for m in FRAME_METRICS if m in snapshot.columns])
+    newer = {str(t).upper() for t in frame.index}
+    previous = previous[[str(t).upper() not in newer for t in previous.index]]
+    previous.index.name = frame.index.name
+    return pd.concat([previous, frame]).reindex(columns=FRAME_METRICS).astype(float)
+
+def write_snapshot(frame, analysis=None, directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """Write a metrics frame (and optional analyze_frame output) as a new snapshot.
+    
+    The snapshot is built in a temporary directory and renamed into place, then
+    LATEST is switched to it, so readers never see a half-written snapshot.
+    Returns the snapshot path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    tmp_path = os.path.join(directory, f'.{name}.tmp')
+    os.makedirs(tmp_path)
+    
+    columns = {m: frame[m].to_numpy(dtype=np.float64, na_value=np.nan) for m in FRAME_METRICS if m in frame}
+    if analysis is not None:
+        for column in ANALYSIS_COLUMNS:
+            columns[column] = analysis[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        codes = {v: i for i, v in enumerate(VERDICTS)}
+        columns['verdict_code'] = np.array([codes[v] for v in analysis['verdict']], dtype=np.int8)
+    
+    tickers = np.array([str(t) for t in frame.index], dtype=str)
+    np.save(os.path.join(tmp_path, 'tickers.npy'), tickers)
+    for column, values in columns.items():
+        np.save(os.path.join(tmp_path, f'{column}.npy'), values)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'created_at': time.time(), 'rows': len(tickers), 'columns': list(columns)}, f)
+    
+    path = os.path.join(directory, name)
+    os.replace(tmp_path, path)
+    _write_latest(directory, name)
+    _prune(directory, keep, name)
+    return path
+
+def _write_latest(directory, name):
+    tmp = os.path.join(directory, LATEST_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(directory, LATEST_FILE))
+
+def _prune(directory, keep, latest):
+    """Delete all but the newest `keep` snapshots, never the latest one"""
+    names = sorted(n for n in os.listdir(directory)
+                   if not n.startswith('.') and n not in (LATEST_FILE, latest))
+    for name in names[:-(keep - 1)] if keep > 1 else names:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class Snapshot:
+    """Read-only view of a snapshot; columns are memory-mapped on first access"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self.tickers = np.load(os.path.join(path, 'tickers.npy'), mmap_mode='r')
+        self._arrays = {}
+        self._positions = None
+    
+    def __len__(self):
+        return self.meta['rows']
+    
+    def column(self, name):
+        """The column as a read-only memory-mapped array"""
+        if name not in self._arrays:
+            if name not in self.columns:
+                raise KeyError(name)
+            self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+    
+    def position(self, ticker):
+        """Row number of a ticker (case-insensitive), or None"""
+        if self._positions is None:
+            self._positions = {t.upper(): i for i, t in enumerate(self.tickers.tolist())}
+        return self._positions.get(ticker.upper())
+    
+    def row(self, ticker):
+        """Dict of every column for one ticker, or None if it isn't in the snapshot"""
+        i = self.position(ticker)
+        if i is None:
+            return None
+        row = {name: self.column(name)[i].item() for name in self.columns}
+        if 'verdict_code' in row:
+            row['verdict'] = VERDICTS[row.pop('verdict_code')]
+        return row
+    
+    def to_frame(self, columns=None):
+        """DataFrame of the requested columns (all by default), indexed by ticker"""
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.column(name) for name in columns},
+                            index=pd.Index(self.tickers.tolist(), name='ticker'))
+
+def open_snapshot(directory=SNAPSHOT_DIR):
+    """The latest snapshot in directory, or None if none has been written"""
+    try:
+        with open(os.path.join(directory, LATEST_FILE), encoding='utf-8') as f:
+            name = f.read().strip()
+        return Snapshot(os.path.join(directory, name))
+    except (OSError, ValueError):
+        return None
@@ -1,9 +1,53 @@
+import numpy as np
 from config import STOCK_CRITERIA
+import metrics
+
+# Metrics analyze_frame reads, one DataFrame column each
+FRAME_METRICS = [
+    'roe', 'pe_ratio', 'debt_to_equity', 'roce', 'cash_flow',
+    'eps_growth', 'peg', 'eps', 'book_value'
+]
+
+# Criteria that can score a point, in the order analyze_stock reports them
+SCORED_METRICS = ['roe', 'pe_ratio', 'debt_to_equity', 'roce', 'cash_flow', 'eps_growth', 'peg']
+
+def criteria_pass_masks(values, criteria):
+    """PASS mask per scored criterion; NaN values never pass.
+    
+    Thresholds may be scalars or arrays that broadcast against the value arrays.
+    """
+    eps_growth = values['eps_growth']
+    return {
+        'roe': values['roe'] > criteria['roe_min'],
+        'pe_ratio': values['pe_ratio'] < criteria['pe_max'],
+        'debt_to_equity': values['debt_to_equity'] < criteria['debt_to_equity_max'],
+        'roce': values['roce'] > criteria['roce_min'],
+        'cash_flow': values['cash_flow'] > 0,
+        'eps_growth': (eps_growth >= criteria['eps_growth_min']) & (eps_growth <= criteria['eps_growth_max']),
+        'peg': values['peg'] < criteria['peg_max'],
+    }
+
+def criteria_total(values):
+    """Number of criteria with data for each stock (the intrinsic value counts but never scores)"""
+    total = sum((~np.isnan(values[m])).astype(np.int64) for m in SCORED_METRICS)
+    return total + (~np.isnan(values['eps']) & ~np.isnan(values['book_value']))
+
+def score_percentages(score, total):
+    """score / total * 100, or 0 where no criteria have data"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, score / np.maximum(total, 1) * 100, 0.0)
+
+def verdict_codes(score_percentage):
+    """2 = BUY, 1 = HOLD, 0 = NA"""
+    return (score_percentage >= 70).astype(np.int8) + (score_percentage >= 50)
+
+VERDICTS = np.array(['NA', 'HOLD', 'BUY'], dtype=object)
 
 class StockAnalyzer:
     def __init__(self):
         self.criteria = STOCK_CRITERIA
         
+    @metrics.timed('analyze_stock')
     def analyze_stock(self, financial_data):
         """Analyze stock based on investment criteria"""
         if not financial_data:
@@ -11,6 +55,8 @@ class StockAnalyzer:
                 'verdict': 'NA',
                 'reason': 'No financial data available',
                 'score': 0,
+                'total_criteria': 0,
+                'score_percentage': 0,
                 'analysis': {}
             }
         
@@ -138,6 +184,85 @@ class StockAnalyzer:
             'analysis': analysis
         }
     
+    def verdict_bounds(self, financial_data, analysis_result=None):
+        """(worst, best) verdict the stock could get once its missing metrics are known.
+
+        A missing criterion may turn out to pass, fail or stay unavailable, so the
+        worst case counts every missing one as failed and the best case counts
+        every missing scored one as passed (the intrinsic value never scores, so
+        it is left out of the best case).
+        """
+        analysis_result = analysis_result or self.analyze_stock(financial_data)
+        analysis = analysis_result['analysis']
+        score = analysis_result['score']
+        total = analysis_result.get('total_criteria', 0)
+        unknown = sum(1 for m in SCORED_METRICS if analysis.get(m, {}).get('status', 'NA') == 'NA')
+        no_intrinsic = analysis.get('intrinsic_value', {}).get('status', 'NA') == 'NA'
+
+        worst = score_percentages(np.array([score]), np.array([total + unknown + no_intrinsic]))
+        best = score_percentages(np.array([score + unknown]), np.array([total + unknown]))
+        verdicts = VERDICTS[verdict_codes(np.concatenate([worst, best]))]
+        return verdicts[0], verdicts[1]
+
+    def verdict_decided(self, financial_data, analysis_result=None):
+        """True if the metrics still missing can't change the verdict"""
+        worst, best = self.verdict_bounds(financial_data, analysis_result)
+        return worst == best
+
+    @metrics.timed('analyze_frame')
+    def analyze_frame(self, frame):
+        """Vectorized analyze_stock over a DataFrame with one row per stock.
+        
+        Missing metrics are NaN. Returns a DataFrame on the same index with the
+        verdict, reason, score, total_criteria, score_percentage and intrinsic_value
+        of each stock plus a <metric>_status column per criterion, matching what
+        analyze_stock returns for the same values.
+        """
+        # pandas is only needed here; keep it off the import path of analyze_stock
+        import pandas as pd
+        
+        values = {
+            m: frame[m].to_numpy(dtype=float, na_value=np.nan) if m in frame else np.full(len(frame), np.nan)
+            for m in FRAME_METRICS
+        }
+        passes = criteria_pass_masks(values, self.criteria)
+        
+        score = sum(passes[m].astype(np.int64) for m in SCORED_METRICS)
+        total = criteria_total(values)
+        score_percentage = score_percentages(score, total)
+        verdict = VERDICTS[verdict_codes(score_percentage)]
+        
+        has_intrinsic = ~np.isnan(values['eps']) & ~np.isnan(values['book_value'])
+        intrinsic_value = self.criteria['intrinsic_value_multiplier'] * values['eps'] * values['book_value']
+        
+        result = pd.DataFrame({
+            'verdict': verdict,
+            'reason': self._frame_reasons(verdict, score, total, score_percentage),
+            'score': score,
+            'total_criteria': total,
+            'score_percentage': score_percentage,
+            'intrinsic_value': np.where(has_intrinsic, intrinsic_value, np.nan),
+        }, index=frame.index)
+        
+        for m in SCORED_METRICS:
+            known = ~np.isnan(values[m])
+            result[f'{m}_status'] = np.where(known, np.where(passes[m], 'PASS', 'FAIL'), 'NA')
+        result['intrinsic_value_status'] = np.where(has_intrinsic, 'CALCULATED', 'NA')
+        
+        return result
+    
+    def _frame_reasons(self, verdict, score, total, score_percentage):
+        """Reason strings for analyze_frame, worded as in analyze_stock"""
+        templates = {
+            'BUY': "Stock meets {}/{} criteria ({:.1f}%)",
+            'HOLD': "Stock meets {}/{} criteria ({:.1f}%) - Consider holding",
+            'NA': "Stock meets only {}/{} criteria ({:.1f}%) - Not recommended",
+        }
+        return [
+            templates[v].format(s, t, p)
+            for v, s, t, p in zip(verdict, score.tolist(), total.tolist(), score_percentage.tolist())
+        ]
+    
     def get_detailed_analysis(self, analysis_result):
         """Get detailed analysis breakdown"""
         analysis = analysis_result['analysis']
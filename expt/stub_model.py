@@ -0,0 +1,55 @@
+"""
+Offline stand-in for the Gemini model, for measuring throughput without the network
+"""
+
+import random
+import re
+import threading
+import time
+
+class StubModelError(Exception):
+    """Simulated provider failure (e.g. a 429)"""
+    code = 429
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Mimics GenerativeModel.generate_content with configurable latency and failure rate"""
+
+    def __init__(self, latency=0.5, jitter=0.2, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        """Sleep for the simulated latency, then fail or answer in the prompt's format"""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise StubModelError("429 Resource has been exhausted (simulated)")
+        
+        stocks = re.findall(r'^\s*=== STOCK: (.+?) ===\s*$', prompt, re.MULTILINE)
+        if stocks:
+            return StubResponse("\n".join(f"=== STOCK: {name} ===\n{self._answer(name)}" for name in stocks))
+        match = re.search(r'STOCK: (.+)', prompt) or re.search(r'Given that (.+?) has', prompt)
+        name = match.group(1).strip() if match else 'the stock'
+        if 'INSIGHTS:' not in prompt:
+            return StubResponse(f"Stub advice for {name}: review the fundamentals before investing.")
+        return StubResponse(self._answer(name))
+
+    def _answer(self, name):
+        return (
+            f"INSIGHTS:\n{name} stub insight one.\n{name} stub insight two.\n\n"
+            f"RECOMMENDATIONS:\n1. Stub recommendation for {name}\n2. Review quarterly results\n\n"
+            f"RISK FACTORS:\n- Stub valuation risk\n- Stub sector risk\n\n"
+            f"MARKET CONTEXT:\nStub market context for {name}.\n\n"
+            f"QUICK ADVICE:\nStub advice for {name}: review the fundamentals before investing.\n"
+        )
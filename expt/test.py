@@ -37,6 +37,10 @@ def test_analyzer():
         analyzer = StockAnalyzer()
         result = analyzer.analyze_stock(sample_data)
         
+        # Empty data still has every key callers format
+        empty = analyzer.analyze_stock({})
+        assert (empty['verdict'], empty['total_criteria'], empty['score_percentage']) == ('NA', 0, 0)
+        
         print(f"✅ Analyzer test successful")
         print(f"   Verdict: {result['verdict']}")
         print(f"   Score: {result['score']}/{result['total_criteria']}")
@@ -46,22 +50,741 @@ def test_analyzer():
         print(f"❌ Analyzer test failed: {e}")
         return False
 
+def test_analyze_frame():
+    """Test that vectorized scoring matches the per-stock analyzer"""
+    try:
+        import pandas as pd
+        from stock_analyzer import StockAnalyzer
+        
+        stocks = [
+            {'roe': 20.5, 'pe_ratio': 15.2, 'debt_to_equity': 0.3, 'roce': 18.7, 'cash_flow': 5000,
+             'eps_growth': 12.5, 'peg': 0.8, 'eps': 45.2, 'book_value': 125.5},
+            {'roe': 15, 'pe_ratio': 20, 'debt_to_equity': None, 'roce': 9.1, 'cash_flow': -10,
+             'eps_growth': 15, 'peg': None, 'eps': 3.1, 'book_value': None},
+            {'roe': None, 'pe_ratio': None, 'debt_to_equity': None, 'roce': None, 'cash_flow': None,
+             'eps_growth': None, 'peg': None, 'eps': None, 'book_value': None},
+        ]
+        
+        analyzer = StockAnalyzer()
+        frame_result = analyzer.analyze_frame(pd.DataFrame(stocks))
+        
+        for i, stock in enumerate(stocks):
+            expected = analyzer.analyze_stock(stock)
+            row = frame_result.iloc[i]
+            for key in ['verdict', 'reason', 'score', 'total_criteria', 'score_percentage']:
+                assert row[key] == expected[key], f"row {i} {key}: {row[key]} != {expected[key]}"
+            for metric, data in expected['analysis'].items():
+                assert row[f'{metric}_status'] == data['status'], f"row {i} {metric} status"
+        
+        print("✅ Vectorized analyzer matches per-stock results")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Vectorized analyzer test failed: {e}")
+        return False
+
+def test_threshold_sweep():
+    """Test the what-if sweep against the vectorized analyzer"""
+    try:
+        import pandas as pd
+        from config import STOCK_CRITERIA
+        from stock_analyzer import StockAnalyzer
+        from threshold_sweep import run_sweep
+        
+        frame = pd.DataFrame({
+            'roe': [20.5, 12.0, 30.0], 'pe_ratio': [15.2, 25.0, 18.0], 'debt_to_equity': [0.3, 0.8, None],
+            'roce': [18.7, 10.0, 22.0], 'cash_flow': [5000, -1, 10], 'eps_growth': [12.5, 5.0, None],
+            'peg': [0.8, 2.0, None], 'eps': [45.2, 3.0, 10.0], 'book_value': [125.5, 40.0, 60.0],
+        }, index=['AAA', 'BBB', 'CCC'])
+        
+        result = run_sweep(frame, {'roe_min': [STOCK_CRITERIA['roe_min'], 35], 'pe_max': [STOCK_CRITERIA['pe_max']]})
+        baseline = StockAnalyzer().analyze_frame(frame)['verdict'].value_counts()
+        
+        assert result.loc[0, 'flipped'] == 0, "baseline grid point should not flip any verdict"
+        for verdict in ['BUY', 'HOLD', 'NA']:
+            assert result.loc[0, verdict] == baseline.get(verdict, 0), f"{verdict} count mismatch"
+        assert result.loc[1, 'flipped_tickers'] == ['CCC'], f"unexpected flips {result.loc[1, 'flipped_tickers']}"
+        
+        print("✅ Threshold sweep test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Threshold sweep test failed: {e}")
+        return False
+
+def test_snapshot_merge():
+    """Test that a small batch adds to the snapshot universe instead of replacing it"""
+    try:
+        import tempfile
+        from batch_runner import save_snapshot
+        from threshold_sweep import load_universe, run_sweep
+        
+        def result(symbol, roe):
+            return {'ticker': symbol.lower(), 'status': 'ok', 'url': f'https://www.screener.in/company/{symbol}/',
+                    'fetch_source': 'static', 'financial_data': {'roe': roe, 'pe_ratio': 15.0}}
+        
+        directory = tempfile.mkdtemp()
+        save_snapshot([result('AAA', 20.0), result('BBB', 12.0), result('CCC', 30.0)], directory=directory)
+        save_snapshot([result('AAA', 8.0), result('DDD', 18.0)], directory=directory)
+        
+        frame, source = load_universe(directory)
+        assert source == 'snapshot' and sorted(frame.index) == ['AAA', 'BBB', 'CCC', 'DDD'], \
+            f"universe shrank to the last batch: {sorted(frame.index)}"
+        assert frame.loc['AAA', 'roe'] == 8.0, "newest row should win"
+        sweep = run_sweep(frame, {'roe_min': [10, 60]})
+        assert len(sweep) == 2 and (sweep[['BUY', 'HOLD', 'NA']].sum(axis=1) == 4).all(), "sweep should cover 4 stocks"
+        
+        print("✅ Snapshot merge test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Snapshot merge test failed: {e}")
+        return False
+
+def _bench_page(name='company.html'):
+    """A recorded page from bench/pages"""
+    import os
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', 'pages', name), encoding='utf-8') as f:
+        return f.read()
+
+def test_financial_parsing():
+    """Test that one parse of a company page resolves every metric"""
+    try:
+        from data_fetcher import StockDataFetcher
+        
+        fetcher = StockDataFetcher(verbose=False)
+        data = fetcher.parse_financial_data(_bench_page())
+        # Top ratios card values win over the ROCE % table row
+        assert (data['roe'], data['pe_ratio'], data['roce'], data['book_value']) == (51.5, 28.4, 64.3, 250.0), data
+        # Table rows give their latest value; labels absent from the page stay None
+        assert data['eps'] == 127.02 and data['cash_flow'] == 44338.0, data
+        assert data['debt_to_equity'] is None and data['peg'] is None, data
+        
+        # An exact label match beats an earlier row that merely contains the label
+        index = [('net cash flow', '300'), ('cash from operating activity', '44,338')]
+        assert fetcher._lookup_metric(index, ['Cash Flow', 'Cash from Operating Activity']) == 44338.0
+        assert fetcher._lookup_metric(index, ['Cash Flow']) == 300.0
+        assert fetcher._lookup_metric(index, ['PEG']) is None
+        
+        print("✅ Financial parsing test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Financial parsing test failed: {e}")
+        return False
+
+def test_static_completeness():
+    """Test that blank top ratios stay on the static path and a missing card falls back"""
+    try:
+        from unittest import mock
+        from data_fetcher import StockDataFetcher
+        
+        page = _bench_page()
+        loss_maker = page.replace('<span class="number">28.4</span>', '<span class="number"></span>')
+        no_card = page.replace('id="top-ratios"', 'id="other-ratios"')
+        fetcher = StockDataFetcher(verbose=False)
+        with mock.patch.object(StockDataFetcher, '_extract_with_browser', return_value={'browser': True}):
+            data = fetcher.extract_financial_data('https://www.screener.in/company/LOSS/', html=loss_maker)
+            assert fetcher.last_fetch_source == 'static' and data['pe_ratio'] is None, "blank P/E should stay static"
+            data = fetcher.extract_financial_data('https://www.screener.in/company/GONE/', html=no_card)
+            assert data == {'browser': True}, "missing ratios card should fall back to the browser"
+        
+        print("✅ Static completeness test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Static completeness test failed: {e}")
+        return False
+
+def test_fetch_cache():
+    """Test cache TTL expiry, LRU eviction and partial peer-table records"""
+    try:
+        import os
+        import tempfile
+        from cache import FetchCache, PARTIAL_SOURCE
+        
+        base = 'https://www.screener.in/company/'
+        cache = FetchCache(os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'), ttl_seconds=60, max_mb=0.001)
+        
+        # Entries older than the TTL are misses unless a longer max_age is allowed
+        cache.put(base + 'OLD/', 'x' * 100, {'roe': 10.0})
+        cache._conn.execute("UPDATE company_pages SET fetched_at = fetched_at - 120")
+        assert cache.get(base + 'OLD/') is None
+        assert cache.get(base + 'OLD/', max_age=float('inf'))['financial_data'] == {'roe': 10.0}
+        cache.clear()
+        
+        # Past max_mb (~1 KB) the least recently accessed entry goes first
+        for i, symbol in enumerate(['AAA', 'BBB', 'CCC']):
+            cache.put(base + symbol + '/', 'x' * 300, {'roe': float(i)})
+            cache._conn.execute("UPDATE company_pages SET accessed_at = ? WHERE url = ?", (i, base + symbol + '/'))
+        assert cache.get(base + 'AAA/') is not None  # AAA is now the most recently used
+        cache.put(base + 'DDD/', 'x' * 300, {'roe': 3.0})
+        assert cache.get(base + 'BBB/') is None, "least recently used entry should be evicted"
+        assert all(cache.get(base + s + '/') for s in ('AAA', 'CCC', 'DDD'))
+        cache.clear()
+        
+        # Partial peer-table records are only returned on request, and lose to full pages
+        cache.put(base + 'PEER/', None, {'roe': 20.0}, fetch_source=PARTIAL_SOURCE)
+        assert cache.get(base + 'PEER/') is None and cache.find('PEER') is None
+        assert cache.find('peer', include_partial=True)['fetch_source'] == PARTIAL_SOURCE
+        assert [url for url, _ in cache.iter_financial_data()] == []
+        cache.put(base + 'PEER/consolidated/', '<html></html>', {'roe': 21.0}, fetch_source='static')
+        assert cache.find('PEER', include_partial=True)['financial_data'] == {'roe': 21.0}
+        
+        print("✅ Fetch cache test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fetch cache test failed: {e}")
+        return False
+
+def test_company_index():
+    """Test exact lookups, unconfirmed candidates and their use in search_stock"""
+    try:
+        import os
+        import tempfile
+        from unittest import mock
+        from company_index import CompanyIndex
+        from data_fetcher import StockDataFetcher
+        
+        index = CompanyIndex(os.path.join(tempfile.mkdtemp(), 'index.sqlite3'))
+        index.add('https://www.screener.in/company/HDFCBANK/', ['HDFC Bank Ltd'])
+        assert index.lookup('hdfcbank') and index.lookup('HDFC Bank Limited'), "symbol and name should match exactly"
+        assert index.lookup('HDFC Banks') is None, "near-miss names must not resolve"
+        assert index.candidate('HDFC Banks').endswith('/company/HDFCBANK/'), "near-miss should be a candidate"
+        
+        class Response:
+            status_code = 200
+            def __init__(self, body):
+                self.content = body.encode('utf-8')
+        
+        class Session:
+            body = '<html><body></body></html>'
+            def get(self, url, **kwargs):
+                return Response(self.body)
+        
+        session = Session()
+        fetcher = StockDataFetcher(company_index=index, session=session, verbose=False)
+        with mock.patch.object(StockDataFetcher, '_search_browser', return_value=None) as browser:
+            assert fetcher.search_stock('HDFC Banks').endswith('/company/HDFCBANK/'), "candidate should stand in"
+            assert not browser.called, "candidate should save the browser search"
+            session.body = '<html><body><a href="/company/HDFC/">HDFC Ltd</a></body></html>'
+            assert fetcher.search_stock('HDFC Banks').endswith('/company/HDFC/'), "online search should win"
+        
+        print("✅ Company index test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Company index test failed: {e}")
+        return False
+
+def test_revalidation():
+    """Test conditional refresh: 304, unchanged body and changed body"""
+    try:
+        import os
+        import tempfile
+        from cache import FetchCache
+        from data_fetcher import StockDataFetcher
+        
+        class Response:
+            def __init__(self, status_code, text='', headers=None):
+                self.status_code = status_code
+                self.text = text
+                self.headers = headers or {}
+        
+        class Session:
+            def __init__(self):
+                self.responses = []
+                self.sent_headers = []
+            def get(self, url, headers=None, **kwargs):
+                self.sent_headers.append(headers or {})
+                return self.responses.pop(0)
+        
+        url = 'https://www.screener.in/company/TESTCO/'
+        page = _bench_page()
+        cache = FetchCache(os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'), ttl_seconds=60)
+        session = Session()
+        fetcher = StockDataFetcher(cache=cache, session=session, verbose=False)
+        
+        def stale_entry():
+            cache.put(url, page, {'roe': 51.5}, fetch_source='static', etag='"v1"')
+            cache._conn.execute("UPDATE company_pages SET fetched_at = 0")
+            return cache.get(url, max_age=float('inf'))
+        
+        # 304: unchanged, validators sent, entry fresh again
+        session.responses.append(Response(304, headers={'ETag': '"v1"'}))
+        assert fetcher._revalidate(url, stale_entry()) == (True, None)
+        assert session.sent_headers[-1] == {'If-None-Match': '"v1"'}
+        assert cache.get(url) is not None, "a 304 should renew the entry"
+        
+        # 200 with the same content (server without validators) is unchanged too
+        session.responses.append(Response(200, page))
+        assert fetcher._revalidate(url, stale_entry()) == (True, None)
+        assert cache.get(url) is not None, "an equal hash should renew the entry"
+        
+        # A changed body is returned for re-parsing, with its validators kept
+        changed = page.replace('51.5', '49.0')
+        session.responses.append(Response(200, changed, {'ETag': '"v2"'}))
+        assert fetcher._revalidate(url, stale_entry()) == (False, changed)
+        assert fetcher.last_validators == ('"v2"', None)
+        assert cache.get(url) is None, "a changed page must not renew the stale entry"
+        
+        print("✅ Revalidation test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Revalidation test failed: {e}")
+        return False
+
+def test_single_flight():
+    """Test that concurrent calls for one key share a single execution"""
+    try:
+        import asyncio
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from singleflight import SingleFlight, AsyncSingleFlight, get_group
+        
+        group = SingleFlight('test')
+        started = threading.Event()
+        def fetch(ticker):
+            started.set()
+            time.sleep(0.2)
+            return ticker.lower()
+        
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(group.do, 'TESTCO', fetch, 'TESTCO')
+            started.wait()
+            followers = [pool.submit(group.do, 'TESTCO', fetch, 'TESTCO') for _ in range(3)]
+            other = pool.submit(group.do, 'OTHER', fetch, 'OTHER')
+            results = [f.result() for f in [leader] + followers]
+        assert results == ['testco'] * 4 and other.result() == 'other'
+        assert group.stats() == {'calls': 5, 'executions': 2, 'coalesced': 3, 'in_flight': 0}, group.stats()
+        
+        # Errors are shared too, and the key is free again afterwards
+        def fail():
+            raise ValueError("boom")
+        for _ in range(2):
+            try:
+                group.do('BAD', fail)
+                assert False, "expected ValueError"
+            except ValueError:
+                pass
+        assert group.stats()['executions'] == 4
+        
+        async def coalesce():
+            group = AsyncSingleFlight('test')
+            async def fetch():
+                await asyncio.sleep(0.05)
+                return object()
+            results = await asyncio.gather(*(group.do('TESTCO', fetch) for _ in range(4)))
+            return len(set(map(id, results))), group.stats()['executions']
+        assert asyncio.run(coalesce()) == (1, 1)
+        
+        # A name is registered for one kind of group
+        get_group('test_kind')
+        try:
+            get_group('test_kind', async_group=True)
+            assert False, "expected TypeError"
+        except TypeError:
+            pass
+        
+        print("✅ Single-flight test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Single-flight test failed: {e}")
+        return False
+
+def test_derived_metrics():
+    """Test historical table parsing and the derived multi-year metrics"""
+    try:
+        from financial_tables import parse_financial_tables
+        from derived_metrics import compute_derived_metrics
+        
+        html = """
+        <section id="profit-loss"><table>
+          <thead><tr><th></th><th>Mar 2021</th><th>Mar 2022</th><th>Mar 2023</th><th>Mar 2024</th><th>TTM</th></tr></thead>
+          <tbody>
+            <tr><td>Sales +</td><td>1,000</td><td>1,100</td><td>1,210</td><td>1,331</td><td>1,400</td></tr>
+            <tr><td>Net Profit +</td><td>100</td><td>-20</td><td></td><td>150</td><td>160</td></tr>
+          </tbody>
+        </table></section>
+        <section id="ratios"><table>
+          <thead><tr><th></th><th>Mar 2022</th><th>Mar 2023</th><th>Mar 2024</th></tr></thead>
+          <tbody><tr><td>ROCE %</td><td>20%</td><td>22%</td><td>24%</td></tr></tbody>
+        </table></section>
+        """
+        financials = parse_financial_tables(html, 'https://www.screener.in/company/AAA/')
+        
+        assert financials.row('profit-loss', 'sales').tolist() == [1000, 1100, 1210, 1331], "TTM column should be excluded"
+        assert financials.row('cash-flow', 'cash from operating activity') is None, "missing section should give None"
+        
+        metrics = compute_derived_metrics([financials, None], index=['AAA', 'BBB'])
+        assert abs(metrics.loc['AAA', 'sales_cagr_3y'] - 10.0) < 1e-9, "sales CAGR mismatch"
+        assert metrics.loc['AAA', 'avg_roce_3y'] == 22.0, "average ROCE mismatch"
+        assert metrics.loc['BBB'].drop('fcf_positive_years_5y').isna().all(), "missing company should be all NaN"
+        
+        print("✅ Derived metrics test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Derived metrics test failed: {e}")
+        return False
+
+def test_http_transport():
+    """Test retries on 429/5xx and connection errors, and Retry-After handling"""
+    try:
+        from unittest import mock
+        import requests
+        from http_transport import HTTPTransport
+        
+        class Response:
+            def __init__(self, status_code, headers=None):
+                self.status_code = status_code
+                self.headers = headers or {}
+            def close(self):
+                pass
+        
+        def send(*outcomes):
+            """Patch the underlying Session.request to return/raise outcomes in order"""
+            queue = list(outcomes)
+            def request(self, method, url, **kwargs):
+                outcome = queue.pop(0)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+            return mock.patch('requests.Session.request', request)
+        
+        url = 'https://www.screener.in/company/TESTCO/'
+        transport = HTTPTransport(requests_per_minute=0, max_retries=2, backoff=0.5, backoff_max=10)
+        with mock.patch('http_transport.time.sleep') as sleep:
+            # Transient statuses are retried until one succeeds
+            with send(Response(503), Response(502), Response(200)):
+                assert transport.get(url).status_code == 200
+            assert transport.stats()['retries'] == 2 and sleep.call_count == 2
+            
+            # Retry-After wins over backoff, capped at backoff_max
+            sleep.reset_mock()
+            with send(Response(429, {'Retry-After': '3'}), Response(429, {'Retry-After': '120'}), Response(200)):
+                assert transport.get(url).status_code == 200
+            assert [c.args[0] for c in sleep.call_args_list] == [3.0, 10]
+            
+            # Out of retries the last response is returned; other statuses are never retried
+            with send(Response(503), Response(503), Response(503)):
+                assert transport.get(url).status_code == 503
+            sleep.reset_mock()
+            with send(Response(404)):
+                assert transport.get(url).status_code == 404
+            assert sleep.call_count == 0
+            
+            # Connection errors are retried, then raised
+            with send(*[requests.ConnectionError("refused")] * 3):
+                try:
+                    transport.get(url)
+                    assert False, "expected ConnectionError"
+                except requests.ConnectionError:
+                    pass
+            assert transport.stats()['failed'] == 1
+        
+        print("✅ HTTP transport test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ HTTP transport test failed: {e}")
+        return False
+
+def test_snapshot_store():
+    """Test writing and memory-mapping a columnar snapshot"""
+    try:
+        import tempfile
+        import pandas as pd
+        from snapshot_store import write_snapshot, open_snapshot
+        from stock_analyzer import StockAnalyzer
+        
+        frame = pd.DataFrame({'roe': [20.5, 12.0], 'pe_ratio': [15.2, 25.0], 'roce': [18.7, None]}, index=['AAA', 'BBB'])
+        analysis = StockAnalyzer().analyze_frame(frame)
+        directory = tempfile.mkdtemp()
+        write_snapshot(frame, analysis, directory=directory)
+        
+        snapshot = open_snapshot(directory)
+        assert len(snapshot) == 2, f"expected 2 rows, got {len(snapshot)}"
+        assert snapshot.row('aaa')['verdict'] == analysis.loc['AAA', 'verdict'], "verdict mismatch"
+        assert snapshot.to_frame(['roe']).loc['BBB', 'roe'] == 12.0, "column value mismatch"
+        assert open_snapshot(tempfile.mkdtemp()) is None, "empty directory should have no snapshot"
+        
+        print("✅ Snapshot store test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Snapshot store test failed: {e}")
+        return False
+
+def test_peer_table():
+    """Test parsing a peer table and deciding verdicts from partial records"""
+    try:
+        import os
+        from peers import parse_peer_table
+        from stock_analyzer import StockAnalyzer
+        
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', 'pages', 'peers.html'), encoding='utf-8') as f:
+            peers = parse_peer_table(f.read(), base_url='')
+        assert len(peers) == 10, f"expected 10 peers (median row skipped), got {len(peers)}"
+        beta = next(p for p in peers if p['url'] == '/company/BETACORP/')
+        assert beta['financial_data']['pe_ratio'] == 42.7 and beta['financial_data']['cash_flow'] is None, "peer values mismatch"
+        # The ROE header is wrapped in a tooltip <span> and link
+        assert beta['financial_data']['roe'] == 8.1 and beta['financial_data']['eps'] == 9.6, "wrapped or unit headers not matched"
+        
+        analyzer = StockAnalyzer()
+        assert analyzer.verdict_bounds(beta['financial_data']) == ('NA', 'NA'), "weak peer should be decided as NA"
+        assert not analyzer.verdict_decided({'roe': 20.5, 'pe_ratio': 15.2}), "two metrics can't decide a verdict"
+        
+        print("✅ Peer table test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Peer table test failed: {e}")
+        return False
+
+def test_peer_harvest():
+    """Test harvesting peers into results, partial cache records and a full-page snapshot"""
+    try:
+        import os
+        import tempfile
+        from batch_runner import harvest_peers
+        from cache import FetchCache
+        from peers import parse_peer_table
+        from snapshot_store import results_to_frame, write_snapshot, open_snapshot
+        from stock_analyzer import StockAnalyzer
+        
+        base = 'https://www.screener.in'
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', 'pages', 'peers.html'), encoding='utf-8') as f:
+            peers = parse_peer_table(f.read(), base_url=base)
+        directory = tempfile.mkdtemp()
+        cache = FetchCache(path=os.path.join(directory, 'cache.sqlite3'))
+        # A full page cached under the consolidated URL the peer link doesn't use
+        alpha = {'roe': 22.0, 'pe_ratio': 14.1, 'debt_to_equity': 0.05, 'roce': 26.3, 'cash_flow': 900.0}
+        cache.put(f'{base}/company/ALPHAIND/consolidated/', '<html></html>', alpha, 'static')
+        
+        seed = {'ticker': 'testco', 'status': 'ok', 'url': f'{base}/company/TESTCO/consolidated/', 'peers': peers}
+        results, undecided = harvest_peers([seed], StockAnalyzer(), cache)
+        sources = {r['ticker']: r['fetch_source'] for r in results}
+        
+        assert 'TESTCO' not in sources and 'TESTCO' not in undecided, "seed harvested as its own peer"
+        assert sources.get('ALPHAIND') == 'cache', "full cache entry not used"
+        assert sorted(undecided) == ['DELTAENG', 'THETAFIN', 'ZETAPOWER'], f"unexpected undecided {undecided}"
+        assert sources.get('BETACORP') == 'peers', "decided peer not scored from its row"
+        
+        beta_url = f'{base}/company/BETACORP/'
+        assert cache.get(beta_url) is None, "partial record served as a full cache hit"
+        assert cache.get(beta_url, include_partial=True)['fetch_source'] == 'peers', "partial record not cached"
+        assert [u for u, _ in cache.iter_financial_data()] == [f'{base}/company/ALPHAIND/consolidated/'], \
+            "partial records leaked into iter_financial_data"
+        
+        write_snapshot(results_to_frame(results + [dict(seed, fetch_source='static', financial_data=alpha)]),
+                       directory=os.path.join(directory, 'snap'))
+        tickers = sorted(open_snapshot(os.path.join(directory, 'snap')).to_frame().index)
+        assert tickers == ['ALPHAIND', 'TESTCO'], f"snapshot holds partial records: {tickers}"
+        cache.close()
+        
+        print("✅ Peer harvest test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Peer harvest test failed: {e}")
+        return False
+
+def test_command_line():
+    """Test that bare words form one stock name and commas separate several"""
+    try:
+        from main import parse_args, stock_names
+        
+        assert stock_names(parse_args(['Tata', 'Motors']).stocks) == ['Tata Motors']
+        assert stock_names(parse_args(['TCS,', 'Tata', 'Motors']).stocks) == ['TCS', 'Tata Motors']
+        assert stock_names(parse_args(['TCS,INFY']).stocks) == ['TCS', 'INFY']
+        assert stock_names(parse_args(['--offline']).stocks) == []
+        
+        print("✅ Command line test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Command line test failed: {e}")
+        return False
+
 def test_ai_advisor():
     """Test AI advisor initialization"""
     try:
-        from ai_advisor import AIAdvisor
+        from ai_advisor import AIAdvisor, is_error_result
+        from stub_model import StubModel
         
         advisor = AIAdvisor()
         if advisor.model:
             print("✅ AI Advisor initialized with API key")
         else:
             print("⚠️ AI Advisor initialized without API key (normal)")
+        
+        # Failed calls come back as a recognisable error result (never memoized by the web app)
+        analysis = {'verdict': 'HOLD', 'score': 4, 'total_criteria': 7, 'score_percentage': 57.1, 'reason': 'test'}
+        stub = StubModel(latency=0, jitter=0)
+        assert not is_error_result(AIAdvisor(model=stub).get_full_analysis('TESTCO', {'roe': 18.0}, analysis, combined=True))
+        failing = StubModel(latency=0, jitter=0, failure_rate=1.0)
+        assert is_error_result(AIAdvisor(model=failing).get_full_analysis('TESTCO', {'roe': 18.0}, analysis, combined=True))
+        print("✅ AI error results detected")
         return True
         
     except Exception as e:
         print(f"❌ AI Advisor test failed: {e}")
         return False
 
+def test_response_cache():
+    """Test that identical prompts reuse a cached AI response until it expires"""
+    try:
+        import os
+        import tempfile
+        from ai_advisor import AIAdvisor
+        from cache import ResponseCache
+        from stub_model import StubModel
+        
+        cache = ResponseCache(os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'), ttl_seconds=60, max_entries=2)
+        model = StubModel(latency=0, jitter=0)
+        advisor = AIAdvisor(response_cache=cache, model=model)
+        first = advisor.get_quick_advice('TESTCO', 'BUY')
+        assert advisor.get_quick_advice('TESTCO', 'BUY') == first and model.calls == 1
+        advisor.get_quick_advice('TESTCO', 'SELL')
+        assert model.calls == 2, "a different prompt needs its own call"
+        
+        # The key covers the model name as well as the prompt
+        assert cache.get('stub', 'prompt') is None
+        cache.put('stub', 'prompt', 'answer')
+        assert cache.get('stub', 'prompt') == 'answer' and cache.get('other', 'prompt') is None
+        
+        # Expired entries are misses; past max_entries the least recently used go
+        cache._conn.execute("UPDATE ai_responses SET created_at = created_at - 120")
+        assert cache.get('stub', 'prompt') is None
+        assert cache.stats()['entries'] == 2
+        
+        print("✅ Response cache test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Response cache test failed: {e}")
+        return False
+
+def test_ai_parsing():
+    """Test parsing of structured AI responses and splitting of batch responses"""
+    try:
+        from ai_advisor import AIAdvisor
+        from stub_model import StubModel, StubResponse
+        
+        advisor = AIAdvisor(model=StubModel(latency=0, jitter=0))
+        result = advisor._parse_ai_response(
+            "Sure, here is the analysis.\n\n"
+            "## Key Insights\n- Margins are **expanding**\n- Debt is low\n\n"
+            "**Recommendations:**\n1. Accumulate on dips\n   below 3,000\n2) Review results\n\n"
+            "Risks: Currency exposure\n\n"
+            "MARKET CONTEXT:\nIT demand is recovering.\nValuations are stretched.\n\n"
+            "3. QUICK ADVICE: Hold for the long term.\n"
+        )
+        assert result['insights'] == "Margins are expanding\nDebt is low", result['insights']
+        assert result['recommendations'] == ["Accumulate on dips below 3,000", "Review results"]
+        assert result['risk_factors'] == ["Currency exposure"]
+        assert result['market_context'] == "IT demand is recovering. Valuations are stretched."
+        assert result['quick_advice'] == "Hold for the long term."
+        assert advisor._parse_ai_response("No headings at all")['insights'] == 'No specific insights available'
+        
+        parts = advisor._split_batch_response(
+            "=== STOCK: tcs ===\nINSIGHTS:\nTCS text\n**=== STOCK: Infosys ===**\nINSIGHTS:\nInfosys text\n"
+        )
+        assert set(parts) == {'TCS', 'INFOSYS'} and 'Infosys' not in parts['TCS'], parts
+        
+        # A stock missing from the batch response is retried with its own call
+        class DroppingModel(StubModel):
+            def generate_content(self, prompt):
+                text = super().generate_content(prompt).text
+                return StubResponse(text.split("=== STOCK: BETA ===")[0])
+        model = DroppingModel(latency=0, jitter=0)
+        analysis = {'verdict': 'HOLD', 'score': 4, 'total_criteria': 7, 'score_percentage': 57.1, 'reason': 'test'}
+        results = AIAdvisor(model=model).get_batch_analysis(
+            [('ALPHA', {'roe': 18.0}, analysis), ('BETA', {'roe': 12.0}, analysis)]
+        )
+        assert results['ALPHA']['insights'].startswith("ALPHA stub insight")
+        assert results['BETA']['insights'].startswith("BETA stub insight") and model.calls == 2
+        
+        print("✅ AI parsing test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ AI parsing test failed: {e}")
+        return False
+
+def test_llm_scheduler():
+    """Test AI call retries, timeouts and the quick advice fallback"""
+    try:
+        import asyncio
+        import time
+        from ai_advisor import AIAdvisor
+        from llm_scheduler import AsyncLLMScheduler, AsyncAIAdvisor
+        from stub_model import StubModel, StubModelError, StubResponse
+        
+        # A 429 is retried until max_retries is used up, then raised
+        model = StubModel(latency=0, jitter=0, failure_rate=1.0)
+        scheduler = AsyncLLMScheduler(model, requests_per_minute=6000, max_retries=2, backoff=0)
+        try:
+            asyncio.run(scheduler.generate("prompt"))
+            assert False, "expected StubModelError"
+        except StubModelError:
+            pass
+        assert model.calls == 3 and scheduler.stats['retries'] == 2
+        
+        # Errors that can't succeed on retry (auth, bad request) are raised at once
+        class ForbiddenModel:
+            calls = 0
+            def generate_content(self, prompt):
+                self.calls += 1
+                raise PermissionError("403 API key not valid")
+        model = ForbiddenModel()
+        scheduler = AsyncLLMScheduler(model, requests_per_minute=6000, max_retries=2, backoff=0)
+        try:
+            asyncio.run(scheduler.generate("prompt"))
+            assert False, "expected PermissionError"
+        except PermissionError:
+            pass
+        assert model.calls == 1 and scheduler.stats['retries'] == 0
+        
+        # A timed-out call keeps its concurrency slot until its thread finishes
+        async def timed_out_slot():
+            scheduler = AsyncLLMScheduler(StubModel(latency=0.3, jitter=0), max_concurrency=1,
+                                          requests_per_minute=6000, timeout=0.05, max_retries=0)
+            try:
+                await scheduler.generate("prompt")
+                assert False, "expected a timeout"
+            except asyncio.TimeoutError:
+                pass
+            held = scheduler._semaphore.locked()
+            await asyncio.sleep(0.4)
+            return held, scheduler._semaphore.locked()
+        assert asyncio.run(timed_out_slot()) == (True, False)
+        
+        # A combined response without quick advice falls back to asking for it alone
+        class NoQuickAdviceModel(StubModel):
+            def generate_content(self, prompt):
+                response = super().generate_content(prompt)
+                return StubResponse(response.text.split("QUICK ADVICE:")[0])
+        model = NoQuickAdviceModel(latency=0, jitter=0)
+        advisor = AsyncAIAdvisor(AIAdvisor(model=model),
+                                 AsyncLLMScheduler(model, requests_per_minute=6000, backoff=0))
+        analysis = {'verdict': 'HOLD', 'score': 4, 'total_criteria': 7, 'score_percentage': 57.1, 'reason': 'test'}
+        result = asyncio.run(advisor.get_full_analysis('TESTCO', {'roe': 18.0}, analysis))
+        assert result['quick_advice'].startswith("Stub advice for TESTCO"), result['quick_advice']
+        assert result['insights'].startswith("TESTCO stub insight") and model.calls == 2
+        
+        print("✅ LLM scheduler test successful")
+        return True
+        
+    except Exception as e:
+        print(f"❌ LLM scheduler test failed: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🧪 Testing Stock Analysis Tool Components")
@@ -70,7 +793,25 @@ def main():
     tests = [
         test_imports,
         test_analyzer,
-        test_ai_advisor
+        test_analyze_frame,
+        test_threshold_sweep,
+        test_financial_parsing,
+        test_static_completeness,
+        test_fetch_cache,
+        test_company_index,
+        test_revalidation,
+        test_single_flight,
+        test_derived_metrics,
+        test_http_transport,
+        test_snapshot_store,
+        test_snapshot_merge,
+        test_peer_table,
+        test_peer_harvest,
+        test_command_line,
+        test_ai_advisor,
+        test_response_cache,
+        test_ai_parsing,
+        test_llm_scheduler
     ]
     
     passed = 0
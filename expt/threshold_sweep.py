@@ -0,0 +1,118 @@
+"""
+What-if engine: re-score a cached universe over a grid of criteria thresholds
+"""
+
+import itertools
+import sys
+import numpy as np
+import pandas as pd
+from cache import get_shared_cache
+from company_index import company_path
+from config import SNAPSHOT_DIR, STOCK_CRITERIA
+from snapshot_store import open_snapshot
+from stock_analyzer import (
+    FRAME_METRICS, SCORED_METRICS, VERDICTS,
+    criteria_pass_masks, criteria_total, score_percentages, verdict_codes
+)
+
+# Thresholds that change scores; intrinsic_value_multiplier never does
+SWEEPABLE = ['roe_min', 'pe_max', 'debt_to_equity_max', 'roce_min', 'eps_growth_min', 'eps_growth_max', 'peg_max']
+
+# Upper bound on grid points x stocks scored at once, to cap temporary memory
+CHUNK_ELEMENTS = 4_000_000
+
+def load_cached_universe(cache=None):
+    """DataFrame of every cached company's financial data, indexed by ticker"""
+    cache = cache or get_shared_cache()
+    records = {}
+    for url, data in cache.iter_financial_data():
+        path = company_path(url) or url
+        records[path.split('/')[2] if path.startswith('/company/') else url] = data
+    frame = pd.DataFrame.from_dict(records, orient='index', columns=FRAME_METRICS)
+    return frame.astype(float)
+
+def load_universe(directory=SNAPSHOT_DIR):
+    """Metrics from the latest batch snapshot, falling back to the page cache"""
+    snapshot = open_snapshot(directory)
+    if snapshot is not None and len(snapshot):
+        return snapshot.to_frame([m for m in FRAME_METRICS if m in snapshot.columns]), 'snapshot'
+    return load_cached_universe(), 'cache'
+
+def run_sweep(frame, grid, base_criteria=STOCK_CRITERIA):
+    """Score every stock under every combination of the grid's threshold values.
+    
+    grid maps criteria names (see SWEEPABLE) to lists of values. Returns a
+    DataFrame with one row per grid point: the threshold values, BUY/HOLD/NA
+    counts, and the tickers whose verdict differs from base_criteria.
+    """
+    unknown = set(grid) - set(SWEEPABLE)
+    if unknown:
+        raise ValueError(f"Cannot sweep {sorted(unknown)}; choose from {SWEEPABLE}")
+    
+    names = list(grid)
+    points = np.array(list(itertools.product(*(grid[n] for n in names))), dtype=float)
+    points = points.reshape(len(points), len(names))
+    tickers = np.asarray(frame.index, dtype=object)
+    values = {m: frame[m].to_numpy(dtype=float, na_value=np.nan)[np.newaxis, :] for m in FRAME_METRICS}
+    
+    # Which criteria have data doesn't depend on thresholds, so total is shared
+    total = criteria_total(values)
+    base_codes = _verdict_codes(values, base_criteria, total)
+    
+    counts = np.zeros((len(points), 3), dtype=np.int64)
+    flipped = []
+    chunk = max(1, CHUNK_ELEMENTS // max(len(tickers), 1))
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        criteria = dict(base_criteria)
+        for j, name in enumerate(names):
+            criteria[name] = block[:, j, np.newaxis]
+        
+        codes = _verdict_codes(values, criteria, total)
+        for code in range(3):
+            counts[start:start + len(block), code] = (codes == code).sum(axis=1)
+        flips = codes != base_codes
+        flipped.extend(tickers[row].tolist() for row in flips)
+    
+    result = pd.DataFrame(points, columns=names)
+    for code in reversed(range(len(VERDICTS))):
+        result[VERDICTS[code]] = counts[:, code]
+    result['flipped'] = [len(f) for f in flipped]
+    result['flipped_tickers'] = flipped
+    return result
+
+def _verdict_codes(values, criteria, total):
+    """Verdict codes shaped (grid points, stocks) for broadcast thresholds"""
+    passes = criteria_pass_masks(values, criteria)
+    score = sum(passes[m].astype(np.int64) for m in SCORED_METRICS)
+    return verdict_codes(score_percentages(score, total))
+
+def parse_grid_arg(arg):
+    """'roe_min=10:25:5' (inclusive range) or 'pe_max=15,20,25' -> (name, values)"""
+    name, _, spec = arg.partition('=')
+    if ':' in spec:
+        start, stop, step = (float(x) for x in spec.split(':'))
+        values = np.arange(start, stop + step / 2, step).round(10).tolist()
+    else:
+        values = [float(x) for x in spec.split(',')]
+    return name.strip(), values
+
+def main():
+    """Command line: python threshold_sweep.py roe_min=10:25:1 pe_max=10:30:1"""
+    if len(sys.argv) < 2:
+        print("Usage: python threshold_sweep.py NAME=START:STOP:STEP | NAME=V1,V2,... [...]")
+        print(f"Sweepable criteria: {', '.join(SWEEPABLE)}")
+        return
+    
+    grid = dict(parse_grid_arg(arg) for arg in sys.argv[1:])
+    frame, source = load_universe()
+    if frame.empty:
+        print("❌ No cached companies to sweep. Run a batch first.")
+        return
+    
+    result = run_sweep(frame, grid)
+    print(f"📊 {len(result)} grid points x {len(frame)} stocks from {source}\n")
+    print(result.drop(columns='flipped_tickers').to_string(index=False))
+
+if __name__ == "__main__":
+    main()
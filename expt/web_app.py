@@ -1,9 +1,196 @@
 import streamlit as st
 import pandas as pd
-import time
-from data_fetcher import StockDataFetcher
+from data_fetcher import StockDataFetcher, get_driver_pool
 from stock_analyzer import StockAnalyzer
-from ai_advisor import AIAdvisor
+from ai_advisor import AIAdvisor, is_error_result
+from cache import get_shared_cache, get_response_cache
+from company_index import get_company_index, normalize_name
+from config import WEB_RESULT_TTL_SECONDS
+from singleflight import get_group
+from snapshot_store import open_snapshot
+from stock_analyzer import VERDICTS
+
+@st.cache_resource
+def get_fetch_resources():
+    """Browser pool, page cache and company index shared by every session"""
+    return {
+        'driver_pool': get_driver_pool(),
+        'cache': get_shared_cache(),
+        'company_index': get_company_index(),
+    }
+
+@st.cache_resource
+def get_ai_advisor():
+    """One AIAdvisor (and configured model) shared by every session"""
+    return AIAdvisor(response_cache=get_response_cache(), single_flight=get_group('ai'))
+
+@st.cache_resource
+def get_refresh_versions():
+    """Per-ticker refresh counters shared by every session, part of the memo key"""
+    return {}
+
+class StockNotFoundError(Exception):
+    """Search found no company for the name"""
+
+class AIUnavailableError(Exception):
+    """The AI call failed; the message is the advisor's error text"""
+
+@st.cache_resource
+def get_analyzer():
+    """Shared StockAnalyzer"""
+    return StockAnalyzer()
+
+def fetch_and_analyze(stock_name, refresh=False):
+    """Fetch and score a stock; returns (stock_data, analysis_result) or (None, None)"""
+    # Fetchers are cheap and hold per-request state; the expensive parts are shared
+    fetcher = StockDataFetcher(verbose=False, single_flight=get_group('fetch'), **get_fetch_resources())
+    try:
+        stock_data = fetcher.get_stock_data(stock_name, refresh=refresh)
+    finally:
+        fetcher.close()
+    
+    if not stock_data:
+        return None, None
+    return stock_data, get_analyzer().analyze_stock(stock_data['financial_data'])
+
+@st.cache_data(ttl=WEB_RESULT_TTL_SECONDS, show_spinner=False)
+def cached_fetch_and_analyze(stock_name, version=0, _refresh=False):
+    """fetch_and_analyze memoized per ticker and refresh version.
+    
+    Misses raise StockNotFoundError, so they are retried next time instead of
+    being memoized. _refresh is not part of the key.
+    """
+    stock_data, analysis_result = fetch_and_analyze(stock_name, refresh=_refresh)
+    if not stock_data:
+        raise StockNotFoundError(stock_name)
+    return stock_data, analysis_result
+
+def get_stock_result(stock_name, refresh=False):
+    """Memoized (stock_data, analysis_result); a refresh gives only this ticker a new memo entry"""
+    versions = get_refresh_versions()
+    key = normalize_name(stock_name) or stock_name.strip().upper()
+    if refresh:
+        versions[key] = versions.get(key, 0) + 1
+    return cached_fetch_and_analyze(stock_name, versions.get(key, 0), _refresh=refresh)
+
+@st.cache_data(ttl=WEB_RESULT_TTL_SECONDS, show_spinner=False)
+def cached_ai_analysis(stock_name, financial_data, analysis_result):
+    """AI insights and quick advice memoized per ticker and data.
+    
+    Failed calls raise AIUnavailableError, so the next view asks the model
+    again instead of showing a memoized error.
+    """
+    result = get_ai_advisor().get_full_analysis(stock_name, financial_data, analysis_result)
+    if is_error_result(result):
+        raise AIUnavailableError(result['insights'] if result['insights'].startswith('Error') else result['quick_advice'])
+    return result
+
+def render_analysis(stock_data, analysis_result):
+    """Score, verdict, metrics table and raw data"""
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Score", f"{analysis_result['score']}/{analysis_result['total_criteria']}")
+    
+    with col2:
+        st.metric("Score %", f"{analysis_result['score_percentage']:.1f}%")
+    
+    with col3:
+        # Color code the verdict
+        verdict = analysis_result['verdict']
+        if verdict == 'BUY':
+            st.success(f"🎯 {verdict}")
+        elif verdict == 'HOLD':
+            st.warning(f"🎯 {verdict}")
+        else:
+            st.error(f"🎯 {verdict}")
+    
+    # Stock URL
+    st.info(f"📊 Data Source: [Screener.in]({stock_data['url']}) (via {stock_data['fetch_source']})")
+    
+    # Detailed analysis
+    st.subheader("📊 Detailed Analysis")
+    
+    # Create a DataFrame for better display
+    analysis_data = []
+    for metric, data in analysis_result['analysis'].items():
+        status_emoji = {
+            'PASS': '✅',
+            'FAIL': '❌',
+            'CALCULATED': '📊',
+            'NA': '⚠️'
+        }
+        
+        analysis_data.append({
+            'Metric': metric.upper().replace('_', ' '),
+            'Status': f"{status_emoji.get(data['status'], '❓')} {data['status']}",
+            'Value': data['value'] if data['value'] is not None else 'N/A',
+            'Target': data.get('threshold', data.get('formula')) or 'N/A'
+        })
+    
+    df = pd.DataFrame(analysis_data)
+    st.dataframe(df, use_container_width=True)
+    
+    # Raw financial data (collapsible)
+    with st.expander("📋 Raw Financial Data"):
+        financial_df = pd.DataFrame([
+            {"Metric": k.replace('_', ' ').title(), "Value": v}
+            for k, v in stock_data['financial_data'].items()
+        ])
+        st.dataframe(financial_df, use_container_width=True)
+
+def render_ai_insights(stock_name, stock_data, analysis_result):
+    """AI tabs and quick advice, rendered after the analysis is already on screen"""
+    st.subheader("🤖 AI Insights")
+    
+    try:
+        with st.spinner("Getting AI insights..."):
+            ai_insights = cached_ai_analysis(
+                stock_name,
+                stock_data['financial_data'],
+                analysis_result
+            )
+    except AIUnavailableError as e:
+        st.warning(f"⚠️ {e}")
+        return
+    
+    # Display AI insights in tabs
+    tab1, tab2, tab3, tab4 = st.tabs(["💭 Insights", "📝 Recommendations", "⚠️ Risk Factors", "🌍 Market Context"])
+    
+    with tab1:
+        st.write(ai_insights['insights'])
+    
+    with tab2:
+        if ai_insights['recommendations']:
+            for i, rec in enumerate(ai_insights['recommendations'], 1):
+                st.write(f"{i}. {rec}")
+        else:
+            st.write("No specific recommendations available.")
+    
+    with tab3:
+        if ai_insights['risk_factors']:
+            for i, risk in enumerate(ai_insights['risk_factors'], 1):
+                st.write(f"{i}. {risk}")
+        else:
+            st.write("No specific risk factors identified.")
+    
+    with tab4:
+        st.write(ai_insights['market_context'])
+    
+    # Quick advice
+    st.subheader("💡 Quick Advice")
+    st.info(ai_insights['quick_advice'])
+
+def render_snapshot():
+    """Top stocks from the latest batch snapshot, if one has been written"""
+    snapshot = open_snapshot()
+    if snapshot is None or not len(snapshot) or 'verdict_code' not in snapshot.columns:
+        return
+    
+    st.subheader(f"📦 Latest Batch Snapshot ({len(snapshot)} stocks)")
+    frame = snapshot.to_frame(['score_percentage', 'roe', 'pe_ratio', 'roce', 'debt_to_equity'])
+    frame.insert(0, 'verdict', VERDICTS[snapshot.column('verdict_code')])
+    st.dataframe(frame.sort_values('score_percentage', ascending=False).head(50), use_container_width=True)
 
 def main():
     st.set_page_config(
@@ -24,125 +211,25 @@ def main():
         placeholder="e.g., TCS, Reliance, HDFC Bank"
     )
     
+    refresh = st.sidebar.checkbox("Bypass cache (fetch fresh data)", value=False)
+    
     # Analysis button
     analyze_button = st.sidebar.button("🔍 Analyze Stock", type="primary")
     
     # Main content area
     if analyze_button and stock_name:
-        with st.spinner("🔍 Analyzing stock data..."):
-            try:
-                # Initialize components
-                fetcher = StockDataFetcher()
-                analyzer = StockAnalyzer()
-                ai_advisor = AIAdvisor()
-                
-                # Fetch stock data
-                stock_data = fetcher.get_stock_data(stock_name)
-                
-                if not stock_data:
-                    st.error("❌ Could not find stock data. Please check the stock name.")
-                    fetcher.close()
-                    return
-                
-                # Analyze stock
-                analysis_result = analyzer.analyze_stock(stock_data['financial_data'])
-                
-                # Display results
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric("Score", f"{analysis_result['score']}/{analysis_result['total_criteria']}")
-                
-                with col2:
-                    st.metric("Score %", f"{analysis_result['score_percentage']:.1f}%")
-                
-                with col3:
-                    # Color code the verdict
-                    verdict = analysis_result['verdict']
-                    if verdict == 'BUY':
-                        st.success(f"🎯 {verdict}")
-                    elif verdict == 'HOLD':
-                        st.warning(f"🎯 {verdict}")
-                    else:
-                        st.error(f"🎯 {verdict}")
-                
-                # Stock URL
-                st.info(f"📊 Data Source: [Screener.in]({stock_data['url']})")
-                
-                # Detailed analysis
-                st.subheader("📊 Detailed Analysis")
-                
-                # Create a DataFrame for better display
-                analysis_data = []
-                for metric, data in analysis_result['analysis'].items():
-                    status_emoji = {
-                        'PASS': '✅',
-                        'FAIL': '❌',
-                        'CALCULATED': '📊',
-                        'NA': '⚠️'
-                    }
-                    
-                    analysis_data.append({
-                        'Metric': metric.upper().replace('_', ' '),
-                        'Status': f"{status_emoji.get(data['status'], '❓')} {data['status']}",
-                        'Value': data['value'] if data['value'] is not None else 'N/A',
-                        'Target': data['threshold'] if data['threshold'] is not None else 'N/A'
-                    })
-                
-                df = pd.DataFrame(analysis_data)
-                st.dataframe(df, use_container_width=True)
-                
-                # AI Insights
-                st.subheader("🤖 AI Insights")
-                
-                with st.spinner("Getting AI insights..."):
-                    ai_insights = ai_advisor.get_ai_insights(
-                        stock_name,
-                        stock_data['financial_data'],
-                        analysis_result
-                    )
-                
-                # Display AI insights in tabs
-                tab1, tab2, tab3, tab4 = st.tabs(["💭 Insights", "📝 Recommendations", "⚠️ Risk Factors", "🌍 Market Context"])
-                
-                with tab1:
-                    st.write(ai_insights['insights'])
-                
-                with tab2:
-                    if ai_insights['recommendations']:
-                        for i, rec in enumerate(ai_insights['recommendations'], 1):
-                            st.write(f"{i}. {rec}")
-                    else:
-                        st.write("No specific recommendations available.")
-                
-                with tab3:
-                    if ai_insights['risk_factors']:
-                        for i, risk in enumerate(ai_insights['risk_factors'], 1):
-                            st.write(f"{i}. {risk}")
-                    else:
-                        st.write("No specific risk factors identified.")
-                
-                with tab4:
-                    st.write(ai_insights['market_context'])
-                
-                # Quick advice
-                st.subheader("💡 Quick Advice")
-                quick_advice = ai_advisor.get_quick_advice(stock_name, analysis_result['verdict'])
-                st.info(quick_advice)
-                
-                # Raw financial data (collapsible)
-                with st.expander("📋 Raw Financial Data"):
-                    financial_df = pd.DataFrame([
-                        {"Metric": k.replace('_', ' ').title(), "Value": v}
-                        for k, v in stock_data['financial_data'].items()
-                    ])
-                    st.dataframe(financial_df, use_container_width=True)
-                
-                # Clean up
-                fetcher.close()
-                
-            except Exception as e:
-                st.error(f"❌ Error analyzing stock: {str(e)}")
+        try:
+            with st.spinner("🔍 Analyzing stock data..."):
+                stock_data, analysis_result = get_stock_result(stock_name, refresh=refresh)
+            
+            # Score, verdict and metrics render now; AI fills in below once it returns
+            render_analysis(stock_data, analysis_result)
+            render_ai_insights(stock_name, stock_data, analysis_result)
+            
+        except StockNotFoundError:
+            st.error("❌ Could not find stock data. Please check the stock name.")
+        except Exception as e:
+            st.error(f"❌ Error analyzing stock: {str(e)}")
     
     else:
         # Welcome message
@@ -177,6 +264,8 @@ def main():
         **Enter a stock name to get started!**
         """)
         
+        render_snapshot()
+        
         # Example stocks
         st.subheader("💡 Example Stocks to Try:")
         col1, col2, col3 = st.columns(3)